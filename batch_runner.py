@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Headless batch runner: sends every prompt in a JSONL file through the same
+engine the GUI uses and writes one result line per prompt.
+
+Usage:
+    ./batch_runner.py prompts.jsonl --model openai/gpt-4o-mini --concurrency 8 --rate 4
+
+Each input line is a JSON object. The prompt is read from --prompt-field, or
+from "prompt", "content" or "message", or from "title" + "body" (the
+requests.jsonl layout). The id comes from --id-field, "id" or "request_id",
+falling back to the line number. Results are appended to the output file as they
+complete, so an interrupted run resumes by skipping ids that already succeeded.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from local_server import load_config
+from metrics import MetricsStore
+from model_catalog import ModelCatalog
+from openrouter_client import CancelToken, OpenRouterClient, RateLimiter, api_base_url
+from openrouter_engine import ChatAPIError, ChatEngine
+from response_cache import ResponseCache
+
+
+def record_id(record, line_number, id_field=None):
+    if id_field:
+        return str(record[id_field])
+    for field in ("id", "request_id"):
+        if field in record:
+            return str(record[field])
+    return str(line_number)
+
+
+def record_prompt(record, prompt_field=None):
+    if prompt_field:
+        return record[prompt_field]
+    for field in ("prompt", "content", "message"):
+        if field in record:
+            return record[field]
+    if "body" in record:
+        title = record.get("title")
+        return f"{title}\n\n{record['body']}" if title else record["body"]
+    raise ValueError("no prompt field found")
+
+
+def read_prompts(input_file, prompt_field=None, id_field=None):
+    """Yield (id, prompt) for every line of a JSONL prompt file"""
+    with open(input_file, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield record_id(record, line_number, id_field), record_prompt(record, prompt_field)
+
+
+def completed_ids(output_file):
+    """Ids that already have a successful result, so a resumed run can skip them"""
+    done = set()
+    if not os.path.exists(output_file):
+        return done
+
+    with open(output_file, 'r') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # Torn last line from an interrupted run
+                continue
+            if result.get("status") == "ok":
+                done.add(result["id"])
+    return done
+
+
+class ResultWriter:
+    """Appends result lines from many worker threads, flushing each one to disk"""
+
+    def __init__(self, output_file):
+        self.file = open(output_file, 'a+')
+        self.lock = threading.Lock()
+
+        # Terminate a torn last line so the next result starts cleanly
+        if self.file.tell() > 0:
+            self.file.seek(self.file.tell() - 1)
+            if self.file.read(1) != "\n":
+                self.file.write("\n")
+
+    def write(self, result):
+        line = json.dumps(result, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run_prompt(engine, prompt_id, prompt, model, system_prompt=None, use_cache=False, cancel_token=None):
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+
+    started_at = time.time()
+    try:
+        result = engine.complete({"model": model, "messages": messages}, use_cache=use_cache,
+                                 cancel_token=cancel_token)
+        return {
+            "id": prompt_id,
+            "status": "ok",
+            "model": model,
+            "prompt": prompt,
+            "response": result["answer"],
+            "thinking": result["thinking"],
+            "usage": result["usage"],
+            "cached": result["cached"],
+            "latency": round(result["latency"], 3)
+        }
+    except ChatAPIError as e:
+        error = e.message
+    except Exception as e:
+        error = str(e)
+
+    return {
+        "id": prompt_id,
+        "status": "error",
+        "model": model,
+        "prompt": prompt,
+        "error": error,
+        "latency": round(time.time() - started_at, 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through OpenRouter")
+    parser.add_argument("input", help="JSONL file with one prompt per line")
+    parser.add_argument("-o", "--output", help="results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("-m", "--model", help="model id (default: last model used in the GUI)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("-r", "--rate", type=float, default=2.0, help="maximum requests per second")
+    parser.add_argument("--system", help="system prompt sent before every prompt")
+    parser.add_argument("--prompt-field", help="JSON field holding the prompt")
+    parser.add_argument("--id-field", help="JSON field holding the prompt id")
+    parser.add_argument("--use-cache", action="store_true", help="serve repeated prompts from the response cache")
+    parser.add_argument("--metrics", help="write per-request timings and per-model percentiles to this JSON file")
+    parser.add_argument("--config", default="config.json", help="GUI config file for the API key and defaults")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    api_key = os.environ.get("OPENROUTER_API_KEY") or config.get("api_key", "")
+    model = args.model or config.get("last_model")
+    if not api_key:
+        parser.error("no API key: set OPENROUTER_API_KEY or save one in the GUI")
+    if not model:
+        parser.error("no model: pass --model")
+
+    output_file = args.output or f"{os.path.splitext(args.input)[0]}.results.jsonl"
+    done = completed_ids(output_file)
+    pending = [(prompt_id, prompt) for prompt_id, prompt in
+               read_prompts(args.input, args.prompt_field, args.id_field) if prompt_id not in done]
+    if done:
+        print(f"Resuming: {len(done)} prompts already completed")
+    print(f"Running {len(pending)} prompts against {model} "
+          f"(concurrency {args.concurrency}, {args.rate} req/s)")
+
+    client = OpenRouterClient(
+        api_key=api_key,
+        base_url=api_base_url(config),
+        connect_timeout=config.get("connect_timeout", 5.0),
+        read_timeout=config.get("read_timeout", 120.0),
+        max_retries=config.get("max_retries", 3),
+        pool_size=max(10, args.concurrency),
+        rate_limiter=RateLimiter(args.rate),
+        on_retry=lambda attempt, delay, reason: print(f"  retry {attempt} in {delay:.1f}s ({reason})")
+    )
+    catalog = ModelCatalog()
+    catalog.load()
+    response_cache = None
+    if args.use_cache:
+        response_cache = ResponseCache(max_entries=config.get("response_cache_max_entries", 200),
+                                       ttl=config.get("response_cache_ttl", 86400))
+        response_cache.load()
+    metrics = MetricsStore(max_records=max(len(pending), 1))
+    engine = ChatEngine(client, catalog, response_cache=response_cache, metrics=metrics)
+
+    writer = ResultWriter(output_file)
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    # One token per prompt, since a token aborts only the connection of the request it was passed to
+    cancel_tokens = {}
+    for prompt_id, prompt in pending:
+        token = CancelToken()
+        future = executor.submit(run_prompt, engine, prompt_id, prompt, model, args.system, args.use_cache, token)
+        cancel_tokens[future] = token
+    remaining = set(cancel_tokens)
+    count = 0
+    failures = 0
+    interrupted = False
+    try:
+        while remaining:
+            try:
+                for future in as_completed(remaining):
+                    remaining.discard(future)
+                    result = future.result()
+                    writer.write(result)
+                    count += 1
+                    if result["status"] != "ok":
+                        failures += 1
+                    print(f"[{count}/{len(pending)}] {result['id']}: {result['status']} ({result['latency']}s)")
+            except KeyboardInterrupt:
+                if interrupted:
+                    # Second Ctrl+C: abort the requests in flight; they come back as errors and are retried on resume
+                    for future in remaining:
+                        cancel_tokens[future].cancel()
+                    print(f"Cancelling {len(remaining)} request(s) in flight")
+                    continue
+                interrupted = True
+                # Drop queued prompts, but record the ones in flight, since they are already being paid for
+                for future in remaining:
+                    future.cancel()
+                remaining = {future for future in remaining if not future.cancelled()}
+                print(f"Interrupted; waiting for {len(remaining)} request(s) in flight (Ctrl+C again to cancel them)")
+        if interrupted:
+            print("Interrupted; rerun the same command to resume")
+            return 130
+    finally:
+        executor.shutdown(wait=False)
+        writer.close()
+        client.close()
+        if args.metrics:
+            metrics.export_json(args.metrics)
+
+    print(f"Done: {len(pending) - failures} ok, {failures} failed -> {output_file}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
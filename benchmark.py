@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmarks against the local mock API.
+
+Usage:
+    ./benchmark.py                          # run everything, print a report
+    ./benchmark.py --json results.json      # also save the numbers
+    ./benchmark.py --baseline results.json  # fail if anything got slower
+
+Benchmarks:
+    overhead     client-side latency of a completion when the server answers instantly
+    ui_stall     longest Tk event-loop stall while a long reply streams (needs a display)
+    memory       memory growth while a stored conversation grows to --messages messages,
+                 through the store, context builder and (with a display) the UI queue
+                 and chat renderer, and after reloading it from the store
+    persistence  append, load, reopen and search times for a --messages-long history
+    proxy        streaming latency through proxy_server.py with more clients than
+                 upstream connections; fails if the proxy opens more than its pool
+
+Every number is "lower is better", so --baseline can flag any value that grew
+by more than --tolerance (default 25%) since the saved run.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from context_builder import ContextBuilder
+from conversation_store import ConversationStore
+from metrics import percentile
+from mock_server import MockServer
+from model_catalog import ModelCatalog
+from openrouter_client import OpenRouterClient
+from openrouter_engine import ChatEngine
+from proxy_server import ProxyServer
+
+MESSAGE_TEXT = ("The quick brown fox jumps over the lazy dog while the benchmark measures how the "
+                "chat history behaves as it grows. ") * 3
+
+
+def sample_message(i):
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}: {MESSAGE_TEXT}"}
+
+
+def bench_overhead(server, requests_count):
+    """p50/p95 wall time of non-streaming and streaming completions with an instant server"""
+    server.settings.update(latency=0.0, token_rate=0.0, tokens=50, error_rate=0.0)
+    client = OpenRouterClient(api_key="mock", base_url=server.base_url, max_retries=0)
+    engine = ChatEngine(client)
+    payload = {"model": "mock/model-0", "messages": [{"role": "user", "content": "Hello"}]}
+    results = {}
+    try:
+        for stream in (False, True):
+            # One warm-up request opens the pooled connection
+            engine.complete(payload, stream=stream)
+            timings = []
+            for _ in range(requests_count):
+                started = time.perf_counter()
+                engine.complete(payload, stream=stream, on_delta=lambda text: None)
+                timings.append(time.perf_counter() - started)
+            mode = "stream" if stream else "request"
+            results[f"overhead_{mode}_p50_ms"] = percentile(timings, 50) * 1000
+            results[f"overhead_{mode}_p95_ms"] = percentile(timings, 95) * 1000
+    finally:
+        client.close()
+    return results
+
+
+def rss_bytes():
+    """Resident set size from /proc, or None where that is not available"""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def hidden_chat_view(name, get_history=lambda: []):
+    """(root, renderer, ui) for a withdrawn Tk window, or None if Tk cannot start (no display)"""
+    try:
+        import tkinter as tk
+        from tkinter import scrolledtext
+        root = tk.Tk()
+    except Exception as e:
+        print(f"  {name} skipped: {e}")
+        return None
+
+    from chat_renderer import ChatRenderer
+    from ui_queue import UIEventQueue
+
+    root.withdraw()
+    text = scrolledtext.ScrolledText(root)
+    text.pack()
+    return root, ChatRenderer(text, get_history), UIEventQueue(root).start()
+
+
+def bench_ui_stall(server, tokens):
+    """Longest gap between 5 ms Tk heartbeats while a reply streams into the chat renderer"""
+    view = hidden_chat_view("ui_stall")
+    if view is None:
+        return {}
+    root, renderer, ui = view
+
+    server.settings.update(latency=0.0, token_rate=0.0, tokens=tokens, error_rate=0.0)
+    client = OpenRouterClient(api_key="mock", base_url=server.base_url, max_retries=0)
+    engine = ChatEngine(client)
+    payload = {"model": "mock/model-0", "messages": [{"role": "user", "content": "Hello"}]}
+
+    gaps = []
+    state = {"last": time.perf_counter(), "done": False}
+
+    def tick():
+        now = time.perf_counter()
+        gaps.append(now - state["last"])
+        state["last"] = now
+        if state["done"]:
+            root.quit()
+        else:
+            root.after(5, tick)
+
+    def run():
+        # Same pattern as the app: the worker posts every delta to the UI queue
+        engine.complete(payload, stream=True,
+                        on_delta=lambda delta: ui.post_text(renderer.append_stream, text=delta))
+        ui.post(state.update, {"done": True})
+
+    renderer.begin_stream("Assistant", "assistant")
+    threading.Thread(target=run, daemon=True).start()
+    root.after(5, tick)
+    root.mainloop()
+    ui.stop()
+    root.destroy()
+    client.close()
+
+    stalls = [max(0.0, gap - 0.005) for gap in gaps]
+    return {
+        "ui_stall_max_ms": max(stalls) * 1000,
+        "ui_stall_p95_ms": percentile(stalls, 95) * 1000,
+        # Tk calls made for the whole reply; coalescing keeps this near one per frame
+        "ui_calls": ui.dispatched
+    }
+
+
+def bench_memory(messages_count):
+    """Memory growth and per-turn context build time as a stored conversation grows.
+
+    Every message takes the app's path: it is appended to a ConversationStore
+    and the history, the context window is rebuilt and, with a display, it is
+    posted through the UI queue and rendered by the ChatRenderer. The Python
+    heap is traced; RSS growth also covers SQLite's and Tk's own allocations.
+    Finally the conversation is reloaded from the store, as on startup.
+    """
+    history = []
+    root, renderer, ui = hidden_chat_view("memory rendering", lambda: history) or (None, None, None)
+    builder = ContextBuilder(default_context_length=128000)
+    build_times = []
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ConversationStore(db_file=os.path.join(directory, "bench.db"), journal_file=None, legacy_file=None)
+        store.open()
+        conversation_id = store.create_conversation("benchmark")
+
+        rss_before = rss_bytes()
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        for i in range(messages_count):
+            message = sample_message(i)
+            store.append(conversation_id, message, model="mock/model-0")
+            history.append(message)
+            started = time.perf_counter()
+            builder.build(history)
+            build_times.append(time.perf_counter() - started)
+            if ui:
+                ui.post(renderer.render_message, message["role"].title(), message["content"], message["role"], True)
+                # Let the queue drain on its own frames, as in the app
+                if i % 50 == 0:
+                    root.update()
+        if ui:
+            while ui.events:
+                root.update()
+        current, peak = tracemalloc.get_traced_memory()
+        rss_after = rss_bytes()
+
+        payload_bytes = sum(len(message["content"]) for message in history)
+        results.update({
+            "memory_growth_mb": (current - baseline) / 1e6,
+            "memory_peak_mb": (peak - baseline) / 1e6,
+            # Growth beyond the message text itself, i.e. what the app adds per message
+            "memory_overhead_bytes_per_message": max(0, current - baseline - payload_bytes) / messages_count,
+            "context_build_p95_ms": percentile(build_times, 95) * 1000
+        })
+        if rss_before is not None:
+            results["memory_rss_growth_mb"] = max(0, rss_after - rss_before) / 1e6
+
+        # Reopening replaces the history with the stored copy and recounts its tokens
+        history = store.load(conversation_id)
+        builder.build(history)
+        if renderer:
+            renderer.show_latest()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results["memory_after_reload_mb"] = (current - baseline) / 1e6
+        store.close()
+
+    if ui:
+        ui.stop()
+        root.destroy()
+    return results
+
+
+def bench_persistence(messages_count):
+    """Append, load, reopen and search times for a large stored history"""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = os.path.join(directory, "bench.db")
+        store = ConversationStore(db_file=db_file, journal_file=None, legacy_file=None)
+        store.open()
+        conversation_id = store.create_conversation("benchmark")
+
+        append_times = []
+        for i in range(messages_count):
+            started = time.perf_counter()
+            store.append(conversation_id, sample_message(i), model="mock/model-0")
+            append_times.append(time.perf_counter() - started)
+        results["append_p50_ms"] = percentile(append_times, 50) * 1000
+        results["append_p95_ms"] = percentile(append_times, 95) * 1000
+        store.close()
+
+        started = time.perf_counter()
+        store.open()
+        results["open_ms"] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        history = store.load(conversation_id)
+        results["load_ms"] = (time.perf_counter() - started) * 1000
+        assert len(history) == messages_count
+
+        # Median of a few runs per query, so one stray checkpoint does not count as a regression
+        search_times = []
+        for query in ("fox", "lazy dog", f"{messages_count // 2}:", "nonexistentword"):
+            runs = []
+            for _ in range(5):
+                started = time.perf_counter()
+                store.search(query)
+                runs.append(time.perf_counter() - started)
+            search_times.append(percentile(runs, 50))
+        results["search_max_ms"] = max(search_times) * 1000
+        store.close()
+    return results
+
+
+def bench_proxy(server, clients, pool_size=2):
+    """Streaming latency with `clients` concurrent clients sharing `pool_size` upstream connections"""
+    server.settings.update(latency=0.05, token_rate=0.0, tokens=50, error_rate=0.0)
+    upstream = OpenRouterClient(api_key="mock", base_url=server.base_url, max_retries=0,
+                                pool_size=pool_size, pool_block=True)
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = ModelCatalog(cache_file=os.path.join(directory, "models.json"))
+        proxy = ProxyServer(("127.0.0.1", 0), upstream, catalog, quiet=True).start()
+        payload = {"model": "mock/model-0", "messages": [{"role": "user", "content": "Hello"}]}
+        connections_before = server.connections
+        timings = []
+        errors = []
+
+        def run():
+            client = OpenRouterClient(api_key="mock", base_url=proxy.base_url, max_retries=0)
+            try:
+                for _ in range(3):
+                    started = time.perf_counter()
+                    ChatEngine(client).complete(payload, stream=True, on_delta=lambda text: None)
+                    timings.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                client.close()
+
+        threads = [threading.Thread(target=run) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        proxy.stop()
+        upstream.close()
+
+    assert not errors, f"proxy requests failed: {errors[0]}"
+    upstream_connections = server.connections - connections_before
+    assert upstream_connections <= pool_size, \
+        f"proxy opened {upstream_connections} upstream connections with a pool of {pool_size}"
+    return {
+        "proxy_stream_p95_ms": percentile(timings, 95) * 1000,
+        "proxy_upstream_connections": upstream_connections
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print and return the metrics that grew by more than `tolerance` since the baseline"""
+    regressions = []
+    for name, value in results.items():
+        previous = baseline.get(name)
+        # Ignore sub-millisecond noise on metrics that are already near zero
+        if previous is None or value <= previous * (1 + tolerance) or value - previous < 0.5:
+            continue
+        regressions.append(name)
+        print(f"REGRESSION {name}: {previous:.2f} -> {value:.2f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks against the mock API")
+    parser.add_argument("--only", nargs="+", choices=["overhead", "ui_stall", "memory", "persistence", "proxy"],
+                        help="run only these benchmarks")
+    parser.add_argument("--messages", type=int, default=10000, help="history size for memory and persistence")
+    parser.add_argument("--requests", type=int, default=200, help="requests per mode for the overhead benchmark")
+    parser.add_argument("--proxy-clients", type=int, default=8, help="concurrent clients for the proxy benchmark")
+    parser.add_argument("--stream-tokens", type=int, default=2000, help="reply length for the UI stall benchmark")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    selected = args.only or ["overhead", "ui_stall", "memory", "persistence", "proxy"]
+    server = MockServer().start()
+    results = {}
+    try:
+        for name in selected:
+            print(f"Running {name}...")
+            if name == "overhead":
+                results.update(bench_overhead(server, args.requests))
+            elif name == "ui_stall":
+                results.update(bench_ui_stall(server, args.stream_tokens))
+            elif name == "memory":
+                results.update(bench_memory(args.messages))
+            elif name == "persistence":
+                results.update(bench_persistence(args.messages))
+            elif name == "proxy":
+                results.update(bench_proxy(server, args.proxy_clients))
+    finally:
+        server.stop()
+
+    for name, value in results.items():
+        print(f"  {name:<36} {value:10.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+"""
+Windowed renderer that keeps only part of a long conversation in the chat Text widget
+"""
+
+import tkinter as tk
+from datetime import datetime
+
+
+class ChatRenderer:
+    """Renders a sliding window of the conversation into a ScrolledText.
+
+    Only the most recent `page_size` messages are drawn at startup. Older
+    messages are paged in from the history when the user scrolls to the top
+    (or clicks the "load earlier" banner), and content far outside the window
+    is evicted so the widget never holds more than `max_rendered` entries.
+
+    Every entry starts at a left-gravity mark named entry<N>; an entry spans
+    from its mark to the next entry's mark. Entries with history=True mirror a
+    message in the history list, which keeps paging in sync. System notices
+    and thinking blocks are display-only and are not re-rendered once evicted.
+    """
+
+    BANNER_TEXT = "▲ Load earlier messages\n"
+
+    def __init__(self, text, get_history, page_size=50, max_rendered=200):
+        self.text = text
+        self.get_history = get_history
+        self.page_size = page_size
+        self.max_rendered = max(max_rendered, page_size)
+
+        self.entries = []
+        self.next_id = 0
+        self.first_index = 0
+        self.has_banner = False
+        self.detached = False
+        self.streaming = None
+        self.thinking_open = False
+        self.paging = False
+
+        self.text.tag_config("load_earlier", foreground="#007acc", justify=tk.CENTER)
+        self.text.tag_bind("load_earlier", "<Button-1>", lambda e: self.load_earlier())
+        self.text.tag_bind("load_earlier", "<Enter>", lambda e: self.text.config(cursor="hand2"))
+        self.text.tag_bind("load_earlier", "<Leave>", lambda e: self.text.config(cursor=""))
+
+        # Watch scrolling so older/newer pages load when the view reaches an edge
+        self.text.configure(yscrollcommand=self.on_yscroll)
+
+    def on_yscroll(self, first, last):
+        self.text.vbar.set(first, last)
+        if self.paging or self.streaming:
+            return
+
+        first, last = float(first), float(last)
+        if first <= 0.0 and last < 1.0 and self.first_index > 0:
+            self.paging = True
+            self.text.after_idle(self.load_earlier)
+        elif self.detached and last >= 1.0 and first > 0.0:
+            self.paging = True
+            self.text.after_idle(self.load_later)
+
+    def show_latest(self):
+        """Clear the widget and render the newest page of history"""
+        self.reset()
+        history = self.get_history()
+        self.first_index = max(0, len(history) - self.page_size)
+
+        self.text.config(state=tk.NORMAL)
+        for message in history[self.first_index:]:
+            self._append_history_message(message)
+        self._update_banner()
+        self.text.config(state=tk.DISABLED)
+        self.text.see(tk.END)
+
+    def reset(self):
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.config(state=tk.DISABLED)
+        for entry in self.entries:
+            self.text.mark_unset(entry["mark"])
+
+        self.entries = []
+        self.first_index = 0
+        self.has_banner = False
+        self.detached = False
+        self.streaming = None
+        self.thinking_open = False
+
+    def render_message(self, sender, message, tag, history=False):
+        self._begin_entry(history)
+        self._insert_message(tk.END, sender, message, tag)
+        self._end_entry()
+
+    def render_thinking(self, sender, thinking_content):
+        self._begin_entry(False)
+        self._insert_timestamp(tk.END)
+
+        # Add thinking header
+        self.text.insert(tk.END, f"{sender}:\n", "thinking")
+
+        # Add thinking content in a box
+        self.text.insert(tk.END, "┌─ Thinking Process ─────────────────────────────────\n", "thinking")
+
+        # Process and display thinking content with proper indentation
+        for line in thinking_content.split('\n'):
+            self.text.insert(tk.END, "│ ", "thinking")
+            self.text.insert(tk.END, f"{line}\n", "thinking")
+
+        self.text.insert(tk.END, "└────────────────────────────────────────────────────\n\n", "thinking")
+        self._end_entry()
+
+    def begin_thinking_stream(self, sender):
+        """Open a thinking box that append_thinking fills in as the model reasons"""
+        self.streaming = self._begin_entry(False)
+        self._insert_timestamp(tk.END)
+        self.text.insert(tk.END, f"{sender}:\n", "thinking")
+        self.text.insert(tk.END, "┌─ Thinking Process ─────────────────────────────────\n│ ", "thinking")
+        self.thinking_open = True
+        self._end_entry()
+
+    def append_thinking(self, text):
+        self.append_stream(text.replace("\n", "\n│ "), "thinking")
+
+    def end_thinking_stream(self):
+        self.append_stream("\n└────────────────────────────────────────────────────\n\n", "thinking")
+        self.thinking_open = False
+        self.streaming = None
+        self._evict_top()
+
+    def begin_stream(self, sender, tag):
+        self.streaming = self._begin_entry(True)
+        self._insert_timestamp(tk.END)
+        self.text.insert(tk.END, f"{sender}: ", tag)
+        self._end_entry()
+
+    def append_stream(self, text, tag=None):
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, text, tag)
+        self.text.config(state=tk.DISABLED)
+        self.text.see(tk.END)
+
+    def end_stream(self, aborted=False):
+        """Close the streamed entry; aborted streams never reach history"""
+        if self.thinking_open:
+            # Nothing of the answer arrived, only the thinking box needs closing
+            self.end_thinking_stream()
+            return
+
+        if self.streaming is not None and aborted:
+            self.streaming["history"] = False
+        self.streaming = None
+        self.append_stream("\n\n")
+        self._evict_top()
+
+    def load_earlier(self):
+        """Page the previous `page_size` history messages in above the window"""
+        self.paging = False
+        if self.first_index <= 0 or self.streaming:
+            return
+
+        history = self.get_history()
+        start = max(0, self.first_index - self.page_size)
+        anchor = self.entries[0]["mark"] if self.entries else None
+
+        self.text.config(state=tk.NORMAL)
+        top = anchor if anchor else "end-1c"
+        self.text.mark_set("page_insert", top)
+        self.text.mark_gravity("page_insert", tk.RIGHT)
+        if anchor:
+            # Let the old first entry slide down past the inserted page
+            self.text.mark_gravity(anchor, tk.RIGHT)
+
+        new_entries = []
+        for message in history[start:self.first_index]:
+            mark = self._new_mark("page_insert")
+            new_entries.append({"mark": mark, "history": True})
+            self._insert_message("page_insert", *self._history_display(message))
+
+        if anchor:
+            self.text.mark_gravity(anchor, tk.LEFT)
+        self.text.mark_unset("page_insert")
+
+        self.entries[0:0] = new_entries
+        self.first_index = start
+        self._update_banner()
+        self._evict_bottom()
+        self.text.config(state=tk.DISABLED)
+
+        # Keep the message the user was looking at in place
+        if anchor:
+            self.text.yview(anchor)
+
+    def load_later(self):
+        """Page newer history back in below the window after loading earlier pages"""
+        self.paging = False
+        if not self.detached:
+            return
+
+        history = self.get_history()
+        last_index = self.first_index + sum(1 for entry in self.entries if entry["history"])
+        end = min(len(history), last_index + self.page_size)
+
+        self.text.config(state=tk.NORMAL)
+        for message in history[last_index:end]:
+            self._append_history_message(message)
+        self.text.config(state=tk.DISABLED)
+
+        if end >= len(history):
+            self.detached = False
+        self._evict_top()
+
+    def _begin_entry(self, history):
+        # New content always goes at the bottom, so jump back if older pages are showing
+        if self.detached:
+            self.show_latest()
+
+        self.text.config(state=tk.NORMAL)
+        entry = {"mark": self._new_mark("end-1c"), "history": history}
+        self.entries.append(entry)
+        return entry
+
+    def _end_entry(self):
+        self.text.config(state=tk.DISABLED)
+        self._evict_top()
+        self.text.see(tk.END)
+
+    def _new_mark(self, index):
+        mark = f"entry{self.next_id}"
+        self.next_id += 1
+        self.text.mark_set(mark, index)
+        self.text.mark_gravity(mark, tk.LEFT)
+        return mark
+
+    def _append_history_message(self, message):
+        self.entries.append({"mark": self._new_mark("end-1c"), "history": True})
+        self._insert_message(tk.END, *self._history_display(message))
+
+    def _history_display(self, message):
+        if message["role"] == "user":
+            return "You", message["content"], "user"
+        return "Assistant", message["content"], "assistant"
+
+    def _insert_timestamp(self, index):
+        timestamp = datetime.now().strftime("%H:%M")
+        self.text.insert(index, f"[{timestamp}] ", "timestamp")
+
+    def _insert_message(self, index, sender, message, tag):
+        self._insert_timestamp(index)
+        self.text.insert(index, f"{sender}: ", tag)
+        self.text.insert(index, f"{message}\n\n")
+
+    def _evict_top(self):
+        """Drop the oldest entries once the window grows past max_rendered"""
+        if len(self.entries) <= self.max_rendered:
+            return
+
+        count = len(self.entries) - self.max_rendered
+        evicted = self.entries[:count]
+        self.text.config(state=tk.NORMAL)
+        self.text.delete(evicted[0]["mark"], self.entries[count]["mark"])
+        for entry in evicted:
+            self.text.mark_unset(entry["mark"])
+            if entry["history"]:
+                self.first_index += 1
+        del self.entries[:count]
+        self._update_banner()
+        self.text.config(state=tk.DISABLED)
+
+    def _evict_bottom(self):
+        """Drop the newest entries after paging in older ones"""
+        if len(self.entries) <= self.max_rendered:
+            return
+
+        evicted = self.entries[self.max_rendered:]
+        self.text.delete(evicted[0]["mark"], "end-1c")
+        for entry in evicted:
+            self.text.mark_unset(entry["mark"])
+        del self.entries[self.max_rendered:]
+        self.detached = True
+
+    def _update_banner(self):
+        if self.first_index > 0 and not self.has_banner:
+            anchor = self.entries[0]["mark"] if self.entries else None
+            if anchor:
+                self.text.mark_gravity(anchor, tk.RIGHT)
+            self.text.insert("1.0", self.BANNER_TEXT, "load_earlier")
+            if anchor:
+                self.text.mark_gravity(anchor, tk.LEFT)
+            self.has_banner = True
+        elif self.first_index <= 0 and self.has_banner:
+            self.text.delete("1.0", "2.0")
+            self.has_banner = False
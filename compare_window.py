@@ -0,0 +1,160 @@
+"""
+Side-by-side comparison of one prompt across several models
+"""
+
+import tkinter as tk
+from tkinter import ttk, scrolledtext, messagebox
+
+from openrouter_engine import ChatAPIError
+
+
+class CompareWindow(tk.Toplevel):
+    """Fans a prompt out to the selected models concurrently.
+
+    Each model gets its own column that streams its reply and, once finished,
+    shows TTFT, total latency, token counts and cost. Models run independently,
+    so a slow one never holds back the display of a fast one.
+    """
+
+    def __init__(self, app, prompt=""):
+        super().__init__(app.root)
+        self.app = app
+        self.title("Compare Models")
+        self.geometry("1200x700")
+        self.configure(bg=app.bg_color)
+        self.columns = {}
+        self.run_id = 0
+
+        # Model selection and prompt
+        top_frame = ttk.Frame(self, style="TFrame")
+        top_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        list_frame = ttk.Frame(top_frame, style="TFrame")
+        list_frame.pack(side=tk.LEFT, fill=tk.Y, padx=(0, 10))
+        ttk.Label(list_frame, text="Models (select several):", style="TLabel").pack(anchor=tk.W)
+
+        self.model_list = tk.Listbox(list_frame, selectmode=tk.MULTIPLE, height=8, width=45,
+                                     bg=app.entry_bg, fg=app.fg_color, bd=0, exportselection=False,
+                                     selectbackground=app.accent_color, font=("Arial", 10))
+        list_scroll = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.model_list.yview)
+        self.model_list.configure(yscrollcommand=list_scroll.set)
+        self.model_list.pack(side=tk.LEFT, fill=tk.Y)
+        list_scroll.pack(side=tk.LEFT, fill=tk.Y)
+
+        for model in app.models:
+            self.model_list.insert(tk.END, model)
+        if app.selected_model.get() in app.models:
+            self.model_list.selection_set(app.models.index(app.selected_model.get()))
+
+        prompt_frame = ttk.Frame(top_frame, style="TFrame")
+        prompt_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        ttk.Label(prompt_frame, text="Prompt:", style="TLabel").pack(anchor=tk.W)
+
+        self.prompt_entry = tk.Text(prompt_frame, height=6, bg=app.entry_bg, fg=app.fg_color,
+                                    insertbackground=app.fg_color, font=("Arial", 11), bd=0,
+                                    padx=10, pady=10, wrap=tk.WORD)
+        self.prompt_entry.pack(fill=tk.BOTH, expand=True)
+        self.prompt_entry.insert("1.0", prompt)
+
+        self.run_btn = tk.Button(prompt_frame, text="Run Comparison", command=self.run,
+                                 bg=app.accent_color, fg=app.fg_color, bd=0, padx=20, pady=5,
+                                 font=("Arial", 10, "bold"), cursor="hand2")
+        self.run_btn.pack(anchor=tk.E, pady=(5, 0))
+
+        # One column per model is created on each run
+        self.results_frame = ttk.Frame(self, style="TFrame")
+        self.results_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+
+    def run(self):
+        prompt = self.prompt_entry.get("1.0", tk.END).strip()
+        models = [self.model_list.get(i) for i in self.model_list.curselection()]
+        if not prompt or len(models) < 1:
+            messagebox.showwarning("Warning", "Enter a prompt and select at least one model", parent=self)
+            return
+
+        for child in self.results_frame.winfo_children():
+            child.destroy()
+        self.columns = {}
+        # Replies still arriving from an earlier run are ignored
+        self.run_id += 1
+        run_id = self.run_id
+
+        for index, model in enumerate(models):
+            self.columns[model] = self.create_column(index, model)
+            self.results_frame.columnconfigure(index, weight=1, uniform="compare")
+        self.results_frame.rowconfigure(0, weight=1)
+
+        # Compare against the current conversation context without adding to it
+        history = self.app.conversation_history + [{"role": "user", "content": prompt}]
+        self.app.log_message(f"Comparing {len(models)} models")
+        self.app.engine.fan_out(history, models, stream=True,
+                                on_delta=lambda model, text: self.app.ui.post_text(self.append_text, run_id, model,
+                                                                                   text=text, channel=model),
+                                on_thinking=lambda model, text: self.app.ui.post_text(self.append_text, run_id, model,
+                                                                                      text=text, tag="thinking",
+                                                                                      channel=model),
+                                on_result=lambda model, result: self.app.ui.post(self.show_result, run_id, model, result),
+                                on_error=lambda model, e: self.app.ui.post(self.show_error, run_id, model, e))
+
+    def create_column(self, index, model):
+        frame = ttk.Frame(self.results_frame, style="TFrame")
+        frame.grid(row=0, column=index, sticky="nsew", padx=(0 if index == 0 else 5, 0))
+
+        ttk.Label(frame, text=model, style="TLabel", font=("Arial", 10, "bold")).pack(anchor=tk.W)
+        stats = ttk.Label(frame, text="Waiting for first token...", style="TLabel", font=("Consolas", 9),
+                          wraplength=350)
+        stats.pack(anchor=tk.W)
+
+        text = scrolledtext.ScrolledText(frame, wrap=tk.WORD, bg=self.app.chat_bg, fg=self.app.fg_color,
+                                         font=("Arial", 10), bd=0, padx=8, pady=8)
+        text.pack(fill=tk.BOTH, expand=True)
+        text.tag_config("thinking", foreground="#d4d4d4", font=("Arial", 9, "italic"), background="#2d2d2d")
+        text.tag_config("error", foreground="#f48771")
+        text.config(state=tk.DISABLED)
+        return {"stats": stats, "text": text, "streamed": False}
+
+    def append_text(self, run_id, model, text, tag=None):
+        column = self.columns.get(model)
+        if run_id != self.run_id or not column or not self.winfo_exists():
+            return
+        if not column["streamed"]:
+            column["stats"].config(text="Streaming...")
+            column["streamed"] = True
+        column["text"].config(state=tk.NORMAL)
+        column["text"].insert(tk.END, text, tag)
+        column["text"].config(state=tk.DISABLED)
+        column["text"].see(tk.END)
+
+    def show_result(self, run_id, model, result):
+        column = self.columns.get(model)
+        if run_id != self.run_id or not column or not self.winfo_exists():
+            return
+
+        # Re-render as one thinking block followed by the answer
+        text = column["text"]
+        text.config(state=tk.NORMAL)
+        text.delete("1.0", tk.END)
+        if result["thinking"]:
+            text.insert(tk.END, f"{result['thinking']}\n\n", "thinking")
+        text.insert(tk.END, result["answer"])
+        text.config(state=tk.DISABLED)
+
+        usage = result["usage"] or {}
+        cost = f"${result['cost']:.5f}" if result["cost"] is not None else "n/a"
+        column["stats"].config(
+            text=f"TTFT {result['ttft']:.2f}s | total {result['latency']:.2f}s | "
+                 f"tokens {usage.get('prompt_tokens', '?')} in / {usage.get('completion_tokens', '?')} out | "
+                 f"cost {cost}")
+        self.app.log_message(f"Compare: {model} finished in {result['latency']:.2f}s", "SUCCESS")
+
+    def show_error(self, run_id, model, error):
+        column = self.columns.get(model)
+        if run_id != self.run_id or not column or not self.winfo_exists():
+            return
+
+        message = error.message if isinstance(error, ChatAPIError) else str(error)
+        column["stats"].config(text="Failed")
+        column["text"].config(state=tk.NORMAL)
+        column["text"].insert(tk.END, f"\n\nError: {message}", "error")
+        column["text"].config(state=tk.DISABLED)
+        self.app.log_message(f"Compare: {model} failed: {message}", "ERROR")
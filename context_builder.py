@@ -0,0 +1,121 @@
+"""
+Token-budgeted selection of the conversation window sent with each request
+"""
+
+import threading
+
+# Rough per-message overhead for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    """Fast local token estimate, roughly 4 characters per token for English text"""
+    if not isinstance(text, str):
+        text = str(text)
+    return max(len(text) // 4, len(text.split())) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextBuilder:
+    """Picks the newest messages that fit the selected model's context window.
+
+    The budget is the model's context_length minus a reserve for the completion.
+    Token counts are cached per history index, so each turn only estimates the
+    messages added since the previous one.
+
+    The window keeps its first message for as long as everything after it
+    fits. When it has to move, it drops enough old messages to free
+    `slide_ratio` of the budget. The prompt prefix therefore changes only
+    every few turns, and provider prompt caches can keep hitting on it.
+
+    build() holds a lock, so the cached counts and window state stay
+    consistent when several threads build payloads at once. Callers working
+    on other histories (e.g. the compare window) should use their own builder
+    from copy(), or they keep resetting the cache and window of this one.
+    """
+
+    def __init__(self, default_context_length=8192, reserve_ratio=0.25,
+                 min_reserve=1024, max_reserve=8192, slide_ratio=0.25):
+        self.default_context_length = default_context_length
+        self.reserve_ratio = reserve_ratio
+        self.min_reserve = min_reserve
+        self.max_reserve = max_reserve
+        self.slide_ratio = slide_ratio
+        self.lock = threading.Lock()
+        self.token_counts = []
+        # The list the counts belong to; held rather than its id(), which a new list can reuse
+        self.history = None
+        # First history index and budget of the previous window
+        self.window_start = 0
+        self.window_budget = None
+
+    def budget(self, model_info=None):
+        """Prompt token budget for a model, leaving room for the completion"""
+        model_info = model_info or {}
+        context_length = model_info.get("context_length") or self.default_context_length
+
+        reserve = min(max(self.min_reserve, int(context_length * self.reserve_ratio)), self.max_reserve)
+        max_completion = (model_info.get("top_provider") or {}).get("max_completion_tokens")
+        if max_completion:
+            reserve = min(reserve, max_completion)
+
+        return max(context_length - reserve, context_length // 2)
+
+    def copy(self):
+        """A new builder with the same settings and an empty cache"""
+        return ContextBuilder(self.default_context_length, self.reserve_ratio,
+                              self.min_reserve, self.max_reserve, self.slide_ratio)
+
+    def count_tokens(self, history):
+        """Per-message token counts, computed incrementally for appended messages"""
+        with self.lock:
+            return list(self._count_tokens(history))
+
+    def _count_tokens(self, history):
+        # A different list (cleared or reloaded history) invalidates the cache
+        counts = self.token_counts
+        if history is not self.history or len(history) < len(counts):
+            self.history = history
+            counts = self.token_counts = []
+            self.window_start = 0
+
+        counts.extend(estimate_tokens(message["content"]) for message in history[len(counts):])
+        return counts
+
+    def build(self, history, model_info=None, first=0, reserved=0):
+        """Return (messages, estimated_tokens) for the newest messages within budget.
+
+        Messages before index `first` are never sent (a summary stands in for
+        them) and `reserved` tokens of the budget are kept for that summary.
+        """
+        budget = self.budget(model_info) - reserved
+        with self.lock:
+            return self._build(history, budget, first)
+
+    def _build(self, history, budget, first):
+        counts = self._count_tokens(history)
+
+        # Work from the counted prefix in case another thread appends meanwhile
+        end = len(counts)
+        # The latest message is always eligible, even if a stale summary claims to cover it
+        floor = max(0, min(first, end - 1))
+
+        # Reuse the previous window start while the window still fits; a new budget starts over
+        start = max(floor, self.window_start) if budget == self.window_budget else floor
+        start = min(start, max(end - 1, 0))
+        total = sum(counts[start:end])
+        if total > budget:
+            # Slide past the old start, leaving headroom so the next turns fit without moving again
+            target = budget * (1 - self.slide_ratio)
+            total = 0
+            start = end
+            while start > floor:
+                tokens = counts[start - 1]
+                # Always send the latest message, even if it alone exceeds the budget
+                if total + tokens > target and start < end:
+                    break
+                total += tokens
+                start -= 1
+
+        self.window_start = start
+        self.window_budget = budget
+        return history[start:end], total
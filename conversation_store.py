@@ -0,0 +1,256 @@
+"""
+SQLite-backed store for named conversations with full-text search
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id INTEGER NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    model TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    conversation_id INTEGER PRIMARY KEY REFERENCES conversations(id) ON DELETE CASCADE,
+    summary TEXT NOT NULL,
+    covered INTEGER NOT NULL,
+    model TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages(conversation_id, id);
+CREATE INDEX IF NOT EXISTS conversations_by_update ON conversations(updated_at);
+"""
+
+# External-content FTS index kept in step with the messages table by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(content, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+# Untitled conversations are listed under the start of their first message
+TITLE_SQL = """
+COALESCE(c.title,
+         (SELECT substr(m.content, 1, 60) FROM messages m
+          WHERE m.conversation_id = c.id ORDER BY m.id LIMIT 1),
+         'New chat')
+"""
+
+
+def read_journal(journal_file):
+    """Live messages from the old JSONL journal, honoring clear markers and skipping a torn tail"""
+    messages = []
+    with open(journal_file, 'rb') as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("op") == "clear":
+                messages = []
+            else:
+                messages.append(record)
+    return messages
+
+
+class ConversationStore:
+    """Keeps every conversation in one SQLite database.
+
+    Messages are indexed by conversation, so opening one only reads its own
+    rows, and an FTS5 index makes search across all history a single index
+    lookup. SQLite builds without FTS5 fall back to a LIKE scan. The
+    connection is shared between threads behind a lock; WAL journaling keeps
+    each append to one small fsync.
+    """
+
+    def __init__(self, db_file="chat_memory.db", journal_file="chat_memory.jsonl",
+                 legacy_file="chat_memory.json"):
+        self.db_file = db_file
+        self.journal_file = journal_file
+        self.legacy_file = legacy_file
+        self.lock = threading.Lock()
+        self.db = None
+        self.fts = False
+
+    def open(self):
+        """Open (creating if needed) the database, importing old journal files on first run"""
+        with self.lock:
+            if self.db is not None:
+                return
+
+            is_new = not os.path.exists(self.db_file)
+            self.db = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.db.row_factory = sqlite3.Row
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("PRAGMA foreign_keys=ON")
+            self.db.executescript(SCHEMA)
+            try:
+                self.db.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                self.fts = False
+
+            if is_new:
+                self._import_old_memory()
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def list_conversations(self):
+        """All conversations, most recently used first"""
+        with self.lock:
+            rows = self.db.execute(f"""
+                SELECT c.id, {TITLE_SQL} AS title, c.updated_at FROM conversations c
+                ORDER BY c.updated_at DESC, c.id DESC
+            """).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest_conversation(self):
+        """Id of the most recently used conversation, creating one if there are none"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT id FROM conversations ORDER BY updated_at DESC, id DESC LIMIT 1").fetchone()
+        if row:
+            return row["id"]
+        return self.create_conversation()
+
+    def create_conversation(self, title=None):
+        now = datetime.now().isoformat()
+        with self.lock, self.db:
+            cursor = self.db.execute(
+                "INSERT INTO conversations (title, created_at, updated_at) VALUES (?, ?, ?)",
+                (title, now, now))
+        return cursor.lastrowid
+
+    def rename_conversation(self, conversation_id, title):
+        with self.lock, self.db:
+            self.db.execute("UPDATE conversations SET title = ? WHERE id = ?",
+                            (title or None, conversation_id))
+
+    def delete_conversation(self, conversation_id):
+        with self.lock, self.db:
+            # Delete messages explicitly so the FTS trigger sees each row
+            self.db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            self.db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    def load(self, conversation_id):
+        """Return one conversation's history"""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT role, content FROM messages WHERE conversation_id = ? ORDER BY id",
+                (conversation_id,)).fetchall()
+        return [{"role": row["role"], "content": row["content"]} for row in rows]
+
+    def append(self, conversation_id, message, model=None):
+        """Add a single message to a conversation"""
+        now = datetime.now().isoformat()
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT INTO messages (conversation_id, role, content, model, created_at) VALUES (?, ?, ?, ?, ?)",
+                (conversation_id, message["role"], message["content"], model, now))
+            self.db.execute("UPDATE conversations SET updated_at = ? WHERE id = ?", (now, conversation_id))
+
+    def clear(self, conversation_id):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+            self.db.execute("DELETE FROM summaries WHERE conversation_id = ?", (conversation_id,))
+
+    def load_summary(self, conversation_id):
+        """(summary, covered message count) of a conversation's compacted history, or None"""
+        with self.lock:
+            row = self.db.execute("SELECT summary, covered FROM summaries WHERE conversation_id = ?",
+                                  (conversation_id,)).fetchone()
+        return (row["summary"], row["covered"]) if row else None
+
+    def save_summary(self, conversation_id, summary, covered, model=None):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO summaries (conversation_id, summary, covered, model, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (conversation_id, summary, covered, model, datetime.now().isoformat()))
+
+    def search(self, query, limit=50):
+        """Messages matching every word of the query across all conversations, newest first.
+
+        Newest-first lets FTS5 stop after `limit` hits instead of ranking every match,
+        which keeps common words fast on large histories.
+        """
+        terms = query.split()
+        if not terms:
+            return []
+
+        with self.lock:
+            if self.fts:
+                # Quote each word so punctuation in the query is never read as FTS syntax
+                match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+                rows = self.db.execute(f"""
+                    SELECT m.id, m.conversation_id, m.role, m.created_at, {TITLE_SQL} AS title,
+                           snippet(messages_fts, 0, '[', ']', '...', 12) AS snippet
+                    FROM messages_fts
+                    JOIN messages m ON m.id = messages_fts.rowid
+                    JOIN conversations c ON c.id = m.conversation_id
+                    WHERE messages_fts MATCH ?
+                    ORDER BY messages_fts.rowid DESC LIMIT ?
+                """, (match, limit)).fetchall()
+            else:
+                conditions = " AND ".join("m.content LIKE ? ESCAPE '\\'" for _ in terms)
+                patterns = ["%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                            for term in terms]
+                rows = self.db.execute(f"""
+                    SELECT m.id, m.conversation_id, m.role, m.created_at, {TITLE_SQL} AS title,
+                           substr(m.content, 1, 120) AS snippet
+                    FROM messages m JOIN conversations c ON c.id = m.conversation_id
+                    WHERE {conditions}
+                    ORDER BY m.id DESC LIMIT ?
+                """, (*patterns, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def _import_old_memory(self):
+        """One-time migration of the JSONL journal (or the older whole-file JSON) into a conversation"""
+        try:
+            if self.journal_file and os.path.exists(self.journal_file):
+                messages = read_journal(self.journal_file)
+            elif self.legacy_file and os.path.exists(self.legacy_file):
+                with open(self.legacy_file, 'r') as f:
+                    messages = json.load(f).get("conversation_history", [])
+            else:
+                return
+        except (OSError, ValueError) as e:
+            print(f"Error importing old memory: {e}")
+            return
+
+        if not messages:
+            return
+
+        now = datetime.now().isoformat()
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO conversations (title, created_at, updated_at) VALUES (?, ?, ?)",
+                ("Imported chat", now, now))
+            self.db.executemany(
+                "INSERT INTO messages (conversation_id, role, content, model, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, m["role"], m["content"], m.get("model"), m.get("timestamp") or now)
+                 for m in messages])
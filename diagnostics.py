@@ -0,0 +1,205 @@
+"""
+Opt-in diagnostics for the Tk thread: an event-loop stall watchdog and handler profiling
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+
+class StallWatchdog:
+    """Reports Tk main-loop stalls together with the stack that caused them.
+
+    A heartbeat re-arms itself with `root.after` every `interval` seconds. A
+    monitor thread checks the time of the last beat; once it is more than
+    `threshold` seconds overdue, it grabs the Tk thread's current stack. When
+    the heartbeat runs again it knows how long the stall lasted, calls
+    `on_stall(duration, stack)` on the Tk thread and queues the report, which
+    the monitor thread appends to `dump_file`.
+    """
+
+    def __init__(self, root, threshold=0.2, interval=0.05, dump_file="ui_stalls.log", on_stall=None):
+        self.root = root
+        self.threshold = threshold
+        self.interval = interval
+        self.dump_file = dump_file
+        self.on_stall = on_stall
+        # Created on the Tk thread, so this is the thread whose stack is sampled
+        self.tk_thread_id = threading.get_ident()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.beat = 0
+        self.last_beat = time.perf_counter()
+        self.captured = None
+        self.pending = []
+        self.stall_count = 0
+        self.worst = 0.0
+        self.thread = None
+
+    def start(self):
+        self.last_beat = time.perf_counter()
+        self.root.after(int(self.interval * 1000), self._heartbeat)
+        self.thread = threading.Thread(target=self._monitor, name="stall-watchdog", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and write out any stalls not yet dumped"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        self._write_pending()
+
+    def _heartbeat(self):
+        if self.stop_event.is_set():
+            return
+
+        now = time.perf_counter()
+        with self.lock:
+            stall = now - self.last_beat - self.interval
+            captured = self.captured
+            self.beat += 1
+            self.last_beat = now
+            self.captured = None
+
+        if stall > self.threshold:
+            stack = captured[1] if captured else None
+            self.stall_count += 1
+            self.worst = max(self.worst, stall)
+            with self.lock:
+                self.pending.append((datetime.now().isoformat(), stall, stack))
+            if self.on_stall:
+                self.on_stall(stall, stack)
+
+        self.root.after(int(self.interval * 1000), self._heartbeat)
+
+    def _monitor(self):
+        while not self.stop_event.wait(self.threshold / 4):
+            with self.lock:
+                overdue = time.perf_counter() - self.last_beat - self.interval > self.threshold
+                beat = self.beat
+                needs_stack = overdue and self.captured is None
+
+            if needs_stack:
+                frame = sys._current_frames().get(self.tk_thread_id)
+                stack = "".join(traceback.format_stack(frame)) if frame is not None else None
+                with self.lock:
+                    # The heartbeat may have run in between; only keep the stack for the current beat
+                    if self.beat == beat and self.captured is None:
+                        self.captured = (beat, stack)
+
+            self._write_pending()
+
+    def _write_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending or not self.dump_file:
+            return
+
+        try:
+            with open(self.dump_file, 'a', encoding="utf-8") as f:
+                for timestamp, stall, stack in pending:
+                    f.write(f"=== {timestamp} Tk thread stalled for {stall * 1000:.0f} ms ===\n")
+                    f.write(stack or "(stack not captured; the stall ended before the watchdog sampled it)\n")
+                    f.write("\n")
+        except OSError as e:
+            print(f"Error writing stall dump: {e}")
+
+
+def innermost_frame(stack):
+    """Last "File ..., line ..., in ..." line of a formatted stack, for one-line log messages"""
+    if not stack:
+        return "unknown"
+    lines = [line.strip() for line in stack.splitlines() if line.strip().startswith("File ")]
+    return lines[-1] if lines else "unknown"
+
+
+class HandlerProfiler:
+    """Runs wrapped UI handlers under cProfile while `enabled` is set.
+
+    Wrapping is cheap and can happen before the config is read; disabled
+    wrappers just call through. Each call's stats are merged into a per-handler
+    total, and calls slower than `report_threshold` are passed to
+    `on_report(name, duration, top_functions)`. `dump` writes the totals as
+    .prof files for pstats or snakeviz.
+    """
+
+    def __init__(self, enabled=False, report_threshold=0.1, top=5, on_report=None):
+        self.enabled = enabled
+        self.report_threshold = report_threshold
+        self.top = top
+        self.on_report = on_report
+        self.stats = {}
+        # cProfile allows one active profiler per thread, so nested handlers run unprofiled
+        self.active = threading.local()
+
+    def wrap(self, name, func):
+        def wrapper(*args, **kwargs):
+            if not self.enabled or getattr(self.active, "running", False):
+                return func(*args, **kwargs)
+            return self._profile(name, func, args, kwargs)
+        wrapper.__name__ = getattr(func, "__name__", name)
+        wrapper.__doc__ = getattr(func, "__doc__", None)
+        return wrapper
+
+    def _profile(self, name, func, args, kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (or debugger) already owns the interpreter's profiling hook
+            return func(*args, **kwargs)
+
+        self.active.running = True
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started
+            self.active.running = False
+            stats = pstats.Stats(profiler)
+            if name in self.stats:
+                self.stats[name].add(stats)
+            else:
+                self.stats[name] = stats
+            if duration >= self.report_threshold and self.on_report:
+                self.on_report(name, duration, self.top_functions(stats, skip=func.__name__))
+
+    def top_functions(self, stats, skip=None):
+        """The `top` functions by cumulative time as (label, seconds) pairs, leaving out `skip`"""
+        stats.sort_stats("cumulative")
+        top = []
+        for function in stats.fcn_list:
+            filename, line, function_name = function
+            # Skip the handler itself, nested wrappers and profiler bookkeeping such as Profile.disable
+            if function_name == skip or filename == __file__ or "_lsprof" in function_name:
+                continue
+            label = function_name if filename == "~" else f"{function_name} ({os.path.basename(filename)}:{line})"
+            top.append((label, stats.stats[function][3]))
+            if len(top) >= self.top:
+                break
+        return top
+
+    def report(self, name):
+        """Text report of the merged stats for one handler"""
+        out = io.StringIO()
+        stats = self.stats[name]
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(20)
+        return out.getvalue()
+
+    def dump(self, prefix="profile_"):
+        """Write every handler's merged stats to <prefix><handler>.prof"""
+        paths = []
+        for name, stats in self.stats.items():
+            path = f"{prefix}{name}.prof"
+            stats.dump_stats(path)
+            paths.append(path)
+        return paths
@@ -0,0 +1,60 @@
+"""
+Structured JSON-lines event log written by a background thread
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime
+
+
+class JsonLineFormatter(logging.Formatter):
+    def format(self, record):
+        event = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": getattr(record, "event_level", record.levelname),
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        event.update(getattr(record, "fields", {}))
+        return json.dumps(event, ensure_ascii=False)
+
+
+class EventLog:
+    """Queues events in memory and writes them to a rotating JSONL file on a listener thread.
+
+    Callers only pay for a queue put, so logging from the Tk thread never waits on disk.
+    """
+
+    # App levels that have no stdlib equivalent are logged as INFO and kept in the record
+    LEVELS = {
+        "ERROR": logging.ERROR,
+        "WARNING": logging.WARNING,
+        "SUCCESS": logging.INFO,
+        "INFO": logging.INFO
+    }
+
+    def __init__(self, log_file="chatbot_events.jsonl", max_bytes=5 * 1024 * 1024, backup_count=3):
+        self.queue = queue.Queue(-1)
+
+        file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                                            backupCount=backup_count, encoding="utf-8")
+        file_handler.setFormatter(JsonLineFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, file_handler)
+        self.listener.start()
+
+        self.logger = logging.getLogger(f"openrouter_chatbot.events.{id(self)}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(logging.handlers.QueueHandler(self.queue))
+
+    def log(self, message, level="INFO", **fields):
+        self.logger.log(self.LEVELS.get(level, logging.INFO), message,
+                        extra={"event_level": level, "fields": fields})
+
+    def close(self):
+        """Flush queued events to disk and stop the writer thread"""
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
@@ -0,0 +1,113 @@
+"""
+Rolling summaries that stand in for older turns of long conversations
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Keep facts, decisions, names, numbers, code identifiers and open questions; drop small talk. "
+    "Write compact bullet points, at most about 300 words."
+)
+
+
+def summary_message(summary):
+    """System message that replaces the summarized turns in a request"""
+    return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+
+
+class HistoryCompactor:
+    """Folds older messages into a per-conversation summary on a background thread.
+
+    Everything but the newest `keep_recent` messages is eligible. Once at least
+    `batch_size` eligible messages are not yet covered, one job sends the
+    previous summary plus just those messages to `model` and stores the
+    result with the number of messages it covers. Each update therefore costs
+    one batch, and the prompt of a normal turn stays at summary + recent turns.
+    """
+
+    def __init__(self, engine, store, model=None, keep_recent=20, batch_size=20, max_tokens=600):
+        self.engine = engine
+        self.store = store
+        self.model = model
+        self.keep_recent = keep_recent
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compactor")
+        self.lock = threading.Lock()
+        self.summaries = {}
+        self.running = set()
+        # Bumped when a conversation is cleared so a job finishing afterwards is discarded
+        self.generations = {}
+
+    def summary_for(self, conversation_id):
+        """(summary, covered message count) for a conversation, or (None, 0)"""
+        with self.lock:
+            if conversation_id in self.summaries:
+                return self.summaries[conversation_id]
+
+        summary = self.store.load_summary(conversation_id) or (None, 0)
+        with self.lock:
+            return self.summaries.setdefault(conversation_id, summary)
+
+    def maybe_compact(self, conversation_id, history, model, on_log=None):
+        """Start a background summary update if enough uncovered messages have built up"""
+        summary, covered = self.summary_for(conversation_id)
+        end = len(history) - self.keep_recent
+        if end - covered < self.batch_size:
+            return False
+
+        with self.lock:
+            if conversation_id in self.running:
+                return False
+            self.running.add(conversation_id)
+            generation = self.generations.get(conversation_id, 0)
+
+        # Copy the batch now; the history list keeps growing on the Tk thread
+        batch = list(history[covered:end])
+        self.executor.submit(self._compact, conversation_id, generation, summary, covered, batch,
+                             self.model or model, on_log)
+        return True
+
+    def forget(self, conversation_id):
+        """Drop the cached summary after the conversation was cleared or deleted"""
+        with self.lock:
+            self.summaries.pop(conversation_id, None)
+            self.generations[conversation_id] = self.generations.get(conversation_id, 0) + 1
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def _compact(self, conversation_id, generation, summary, covered, batch, model, on_log):
+        log = on_log or (lambda message, level="INFO": None)
+        try:
+            log(f"Summarizing {len(batch)} older messages with {model}...")
+            transcript = "\n\n".join(f"{message['role'].capitalize()}: {message['content']}" for message in batch)
+            payload = {
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                    {"role": "user", "content": f"Current summary:\n{summary or '(none yet)'}\n\n"
+                                                f"New messages to fold in:\n{transcript}\n\n"
+                                                f"Reply with the updated summary only."}
+                ],
+                "max_tokens": self.max_tokens
+            }
+            result = self.engine.complete(payload)
+            new_summary = result["answer"].strip()
+            if not new_summary:
+                log("Summary model returned an empty summary; keeping the old one", "WARNING")
+                return
+
+            with self.lock:
+                if self.generations.get(conversation_id, 0) != generation:
+                    return
+                self.summaries[conversation_id] = (new_summary, covered + len(batch))
+                self.store.save_summary(conversation_id, new_summary, covered + len(batch), model)
+            log(f"History summary now covers {covered + len(batch)} messages", "SUCCESS")
+        except Exception as e:
+            log(f"History compaction failed: {e}", "ERROR")
+        finally:
+            with self.lock:
+                self.running.discard(conversation_id)
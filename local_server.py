@@ -0,0 +1,100 @@
+"""
+Plumbing shared by the headless tools: config loading and the local HTTP servers (mock API and proxy)
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# What writing to a client that already hung up raises
+CLIENT_GONE_ERRORS = (BrokenPipeError, ConnectionResetError)
+
+
+def load_config(config_file):
+    """The GUI's config.json as a dict, empty if there is none"""
+    if not os.path.exists(config_file):
+        return {}
+    with open(config_file, 'r') as f:
+        return json.load(f)
+
+
+def api_error(status, message):
+    """Error body in the OpenAI/OpenRouter layout"""
+    return {"error": {"code": status, "message": message}}
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    """Keep-alive request handler with JSON responses and chunked server-sent event streams"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, the body waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body, headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_event_stream(self, headers=None):
+        """Send the headers of a 200 text/event-stream response; the body follows in write_chunk() calls"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def end_event_stream_with_error(self, status, message):
+        """Finish a started event stream with an error event, then close the connection"""
+        self.close_connection = True
+        try:
+            # A blank line first ends any event the stream was cut off in
+            self.write_chunk(b"\n")
+            self.write_event(api_error(status, message))
+            self.write_chunk(b"")
+        except CLIENT_GONE_ERRORS:
+            pass
+
+    def write_event(self, event):
+        self.write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+
+    def write_chunk(self, data):
+        """Write one chunk of a chunked body; an empty chunk ends the body"""
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class APIServer(ThreadingHTTPServer):
+    """Threaded HTTP server that can run in the background and stays quiet about clients hanging up"""
+
+    daemon_threads = True
+    verbose = False
+    thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is routine, not worth a traceback
+        if isinstance(sys.exc_info()[1], CLIENT_GONE_ERRORS):
+            return
+        super().handle_error(request, client_address)
@@ -0,0 +1,151 @@
+"""
+In-memory per-request latency/throughput metrics with per-model percentiles
+"""
+
+import csv
+import json
+import math
+import threading
+import time
+from collections import deque
+
+# Columns exported to CSV, in order
+METRIC_FIELDS = [
+    "timestamp", "model", "status", "cached", "connect", "tls", "ttfb", "ttft", "latency",
+    "prompt_tokens", "cached_tokens", "completion_tokens", "tokens_per_second", "cost", "error"
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers, or None if empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def request_metrics(result, timing=None):
+    """Flatten an engine result and its connection timing into one metrics record"""
+    timing = timing or {}
+    usage = result.get("usage") or {}
+    completion_tokens = usage.get("completion_tokens")
+    # Prompt tokens the provider served from its prompt cache, when it reports them
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+
+    # Throughput over the generation phase only, once the first token has arrived
+    generation_time = result["latency"] - result["ttft"]
+    if generation_time <= 0:
+        generation_time = result["latency"]
+    tokens_per_second = None
+    if completion_tokens and generation_time > 0:
+        tokens_per_second = completion_tokens / generation_time
+
+    return {
+        "timestamp": time.time(),
+        "model": result["model"],
+        "status": "ok",
+        "cached": result["cached"],
+        "connect": timing.get("connect"),
+        "tls": timing.get("tls"),
+        "ttfb": timing.get("ttfb"),
+        "ttft": result["ttft"],
+        "latency": result["latency"],
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "cached_tokens": cached_tokens,
+        "completion_tokens": completion_tokens,
+        "tokens_per_second": tokens_per_second,
+        "cost": result.get("cost"),
+        "error": None
+    }
+
+
+def describe_metrics(metrics):
+    """One-line summary of a request's timings for the System Log"""
+    def ms(value):
+        return "n/a" if value is None else f"{value * 1000:.0f}ms"
+
+    parts = [f"connect {ms(metrics['connect'])}", f"TLS {ms(metrics['tls'])}", f"TTFB {ms(metrics['ttfb'])}",
+             f"TTFT {ms(metrics['ttft'])}", f"total {ms(metrics['latency'])}"]
+    if metrics["prompt_tokens"] is not None:
+        prompt = f"{metrics['prompt_tokens']} in"
+        if metrics.get("cached_tokens") is not None:
+            prompt += (f" ({metrics['cached_tokens']} cached, "
+                       f"{metrics['prompt_tokens'] - metrics['cached_tokens']} uncached)")
+        parts.append(f"tokens {prompt} / {metrics['completion_tokens']} out")
+    if metrics["tokens_per_second"] is not None:
+        parts.append(f"{metrics['tokens_per_second']:.1f} tok/s")
+    return "Timing: " + ", ".join(parts)
+
+
+class MetricsStore:
+    """Keeps the most recent `max_records` request records and aggregates them per model"""
+
+    def __init__(self, max_records=5000, on_record=None):
+        self.records = deque(maxlen=max_records)
+        self.lock = threading.Lock()
+        self.on_record = on_record
+
+    def record(self, metrics):
+        with self.lock:
+            self.records.append(metrics)
+        if self.on_record:
+            self.on_record(metrics)
+
+    def record_error(self, model, latency, error):
+        metrics = {field: None for field in METRIC_FIELDS}
+        metrics.update({
+            "timestamp": time.time(),
+            "model": model,
+            "status": "error",
+            "cached": False,
+            "latency": latency,
+            "error": error
+        })
+        self.record(metrics)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.records)
+
+    def summary(self):
+        """Per-model counts and p50/p95 of latency, TTFT and tokens per second"""
+        by_model = {}
+        for metrics in self.snapshot():
+            by_model.setdefault(metrics["model"], []).append(metrics)
+
+        summary = {}
+        for model, records in by_model.items():
+            # Cache hits would drag the percentiles towards zero, so only network requests count
+            ok = [r for r in records if r["status"] == "ok" and not r["cached"]]
+            stats = {
+                "requests": len(records),
+                "errors": sum(1 for r in records if r["status"] != "ok")
+            }
+            for field in ("latency", "ttft", "ttfb", "tokens_per_second"):
+                values = [r[field] for r in ok if r[field] is not None]
+                stats[f"{field}_p50"] = percentile(values, 50)
+                stats[f"{field}_p95"] = percentile(values, 95)
+            summary[model] = stats
+        return summary
+
+    def recent_latency(self, models, window=900):
+        """p50 latency of each model's successful network requests in the last `window` seconds"""
+        since = time.time() - window
+        latencies = {}
+        for metrics in self.snapshot():
+            if (metrics["model"] in models and metrics["status"] == "ok" and not metrics["cached"]
+                    and metrics["timestamp"] >= since and metrics["latency"] is not None):
+                latencies.setdefault(metrics["model"], []).append(metrics["latency"])
+        return {model: percentile(values, 50) for model, values in latencies.items()}
+
+    def export_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=METRIC_FIELDS)
+            writer.writeheader()
+            for metrics in self.snapshot():
+                writer.writerow({field: metrics.get(field) for field in METRIC_FIELDS})
+
+    def export_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({"requests": self.snapshot(), "summary": self.summary()}, f, indent=2)
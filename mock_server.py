@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenRouter API, for offline development and benchmarks.
+
+Usage:
+    ./mock_server.py --port 8765 --latency 0.3 --token-rate 50 --error-rate 0.1
+
+Then point the app at it with OPENROUTER_API_BASE=http://127.0.0.1:8765/api/v1
+(or "api_base" in config.json). It serves GET /models and POST
+/chat/completions, streaming and non-streaming, with a configurable delay
+before the first byte, a token rate for the reply and random error injection
+(429 with Retry-After, 5xx, or "No instances available").
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+
+from local_server import CLIENT_GONE_ERRORS, APIHandler, APIServer, api_error
+
+API_PREFIX = "/api/v1"
+
+DEFAULT_SETTINGS = {
+    "latency": 0.0,           # seconds before the response headers
+    "token_rate": 0.0,        # reply tokens per second, 0 for as fast as possible
+    "tokens": 50,             # reply length in tokens
+    "error_rate": 0.0,        # probability that a chat request fails
+    "errors": ["429", "500", "502", "503", "no-instances"],
+    "retry_after": 1,         # Retry-After seconds sent with injected 429s
+    "failing_models": [],     # models whose every request fails with "No instances available"
+    "models": 20,             # size of the /models catalog
+    "thinking": False         # stream a reasoning field before the reply
+}
+
+FILLER_WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+                "incididunt ut labore et dolore magna aliqua").split()
+
+
+def model_catalog(count):
+    return [{
+        "id": f"mock/model-{i}",
+        "name": f"Mock Model {i}",
+        "context_length": 8192 * (1 + i % 4),
+        "pricing": {"prompt": "0.000001", "completion": "0.000002"},
+        "top_provider": {"max_completion_tokens": 4096}
+    } for i in range(count)]
+
+
+def message_text(message):
+    """Text of a message whose content is a string or a list of content parts"""
+    content = message.get("content", "")
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def prefix_hashes(model, messages):
+    """Running hash of a model's prompt up to and including each message"""
+    digest = hashlib.sha256(model.encode("utf-8"))
+    hashes = []
+    for message in messages:
+        digest.update(f"{message.get('role')}\0{message_text(message)}\0".encode("utf-8"))
+        hashes.append(digest.copy().hexdigest())
+    return hashes
+
+
+def reply_tokens(messages, count):
+    """Deterministic reply: an echo of the last user message padded with filler words"""
+    last = next((message_text(m) for m in reversed(messages) if m.get("role") == "user"), "")
+    words = ["Mock", "reply", "to:"] + last.split()[:10]
+    while len(words) < count:
+        words.append(FILLER_WORDS[len(words) % len(FILLER_WORDS)])
+    return [word + " " for word in words[:count]]
+
+
+class MockHandler(APIHandler):
+    @property
+    def settings(self):
+        return self.server.settings
+
+    def do_GET(self):
+        if self.path.split("?")[0] != f"{API_PREFIX}/models":
+            return self.send_json(404, api_error(404, "Not found"))
+
+        body = json.dumps({"data": model_catalog(self.settings["models"])}).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_json(200, body, {"ETag": etag})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self.send_json(400, api_error(400, "Invalid JSON"))
+
+        if self.path != f"{API_PREFIX}/chat/completions":
+            return self.send_json(404, api_error(404, "Not found"))
+
+        settings = self.settings
+        time.sleep(settings["latency"])
+
+        model = payload.get("model", "mock/model-0")
+        if model in settings["failing_models"]:
+            return self.send_error_response("no-instances")
+        if settings["error_rate"] and random.random() < settings["error_rate"]:
+            return self.send_error_response(random.choice(settings["errors"]))
+
+        messages = payload.get("messages") or []
+        tokens = reply_tokens(messages, settings["tokens"])
+        usage = {
+            "prompt_tokens": sum(len(message_text(m).split()) for m in messages),
+            "prompt_tokens_details": {"cached_tokens": self.prompt_cache_hit(model, messages)},
+            "completion_tokens": len(tokens),
+            "cost": 0.0
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if payload.get("stream"):
+            return self.stream_reply(model, tokens, usage)
+
+        if settings["token_rate"]:
+            time.sleep(len(tokens) / settings["token_rate"])
+        message = {"role": "assistant", "content": "".join(tokens).strip()}
+        if settings["thinking"]:
+            message["reasoning"] = "Mock reasoning about the request."
+        self.send_json(200, {
+            "id": f"gen-mock-{time.time_ns()}",
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": usage
+        })
+
+    def prompt_cache_hit(self, model, messages):
+        """Tokens of the longest prompt prefix cached by an earlier breakpoint; caches this request's breakpoints"""
+        hashes = prefix_hashes(model, messages)
+        cache = self.server.prompt_cache
+        hit = next((i + 1 for i in range(len(hashes) - 1, -1, -1) if hashes[i] in cache), 0)
+        for i, message in enumerate(messages):
+            content = message.get("content")
+            if isinstance(content, list) and any(isinstance(part, dict) and "cache_control" in part
+                                                 for part in content):
+                cache.add(hashes[i])
+        return sum(len(message_text(m).split()) for m in messages[:hit])
+
+    def stream_reply(self, model, tokens, usage):
+        self.start_event_stream()
+
+        interval = 1.0 / self.settings["token_rate"] if self.settings["token_rate"] else 0.0
+        try:
+            self.write_chunk(b": OPENROUTER PROCESSING\n\n")
+            if self.settings["thinking"]:
+                self.write_event({"model": model, "choices": [{"index": 0, "delta": {
+                    "role": "assistant", "content": "", "reasoning": "Mock reasoning about the request."}}]})
+            for token in tokens:
+                if interval:
+                    time.sleep(interval)
+                self.write_event({"model": model, "choices": [{"index": 0, "delta": {
+                    "role": "assistant", "content": token}}]})
+            self.write_event({"model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            self.write_event({"model": model, "choices": [], "usage": usage})
+            self.write_chunk(b"data: [DONE]\n\n")
+            self.write_chunk(b"")
+        except CLIENT_GONE_ERRORS:
+            # The client cancelled the stream
+            self.close_connection = True
+
+    def send_error_response(self, kind):
+        if kind == "no-instances":
+            return self.send_json(503, {"error": {
+                "code": 503, "message": "No instances available",
+                "metadata": {"provider_name": "Mock", "raw": "all mock instances are busy"}}})
+
+        status = int(kind)
+        headers = {"Retry-After": str(self.settings["retry_after"])} if status == 429 else None
+        message = "Rate limit exceeded" if status == 429 else "Mock upstream error"
+        self.send_json(status, api_error(status, message), headers)
+
+
+class MockServer(APIServer):
+    """The mock API on a background thread; change `settings` at any time to alter behavior"""
+
+    def __init__(self, host="127.0.0.1", port=0, verbose=False, **settings):
+        super().__init__((host, port), MockHandler)
+        self.settings = dict(DEFAULT_SETTINGS, **settings)
+        # Prefix hashes written by cache_control breakpoints, like a provider prompt cache
+        self.prompt_cache = set()
+        self.verbose = verbose
+        # Accepted TCP connections, e.g. to check how many a connection pool really opens
+        self.connections = 0
+        self.connections_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def process_request(self, request, client_address):
+        with self.connections_lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the OpenRouter API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the response headers")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="reply tokens per second (0 = unlimited)")
+    parser.add_argument("--tokens", type=int, default=50, help="reply length in tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability a chat request fails")
+    parser.add_argument("--errors", default=",".join(DEFAULT_SETTINGS["errors"]),
+                        help="comma-separated errors to inject: 429, 5xx status codes, no-instances")
+    parser.add_argument("--fail-model", action="append", default=[], metavar="MODEL",
+                        help="model that always answers \"No instances available\" (repeatable)")
+    parser.add_argument("--models", type=int, default=20, help="number of models in the catalog")
+    parser.add_argument("--thinking", action="store_true", help="send a reasoning field with every reply")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = MockServer(args.host, args.port, verbose=args.verbose, latency=args.latency,
+                        token_rate=args.token_rate, tokens=args.tokens, error_rate=args.error_rate,
+                        errors=args.errors.split(","), failing_models=args.fail_model, models=args.models,
+                        thinking=args.thinking)
+    print(f"Mock OpenRouter API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Disk-cached OpenRouter model catalog with TTL and conditional revalidation
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class ModelCatalogError(Exception):
+    pass
+
+
+class ModelCatalog:
+    """Full model metadata (context_length, pricing, modalities, ...) keyed by id.
+
+    The catalog is persisted to a JSON cache file so the model list is available
+    instantly on launch. Refreshes send If-None-Match / If-Modified-Since so an
+    unchanged catalog costs a 304 instead of the full download.
+    """
+
+    def __init__(self, cache_file="models_cache.json", ttl=3600):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.models = []
+        self.by_id = {}
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = 0.0
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Load the cached catalog from disk, returning True if one was found"""
+        if not os.path.exists(self.cache_file):
+            return False
+
+        try:
+            with open(self.cache_file, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading model cache: {e}")
+            return False
+
+        with self.lock:
+            self._set_models(cache.get("models", []))
+            self.etag = cache.get("etag")
+            self.last_modified = cache.get("last_modified")
+            self.fetched_at = cache.get("fetched_at", 0.0)
+        return bool(self.models)
+
+    def save(self):
+        with self.lock:
+            cache = {
+                "models": self.models,
+                "etag": self.etag,
+                "last_modified": self.last_modified,
+                "fetched_at": self.fetched_at
+            }
+
+        # Write to a temp file first so a crash never leaves a half-written cache
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def is_stale(self):
+        return not self.models or time.time() - self.fetched_at > self.ttl
+
+    def ids(self):
+        with self.lock:
+            return [model['id'] for model in self.models]
+
+    def get(self, model_id):
+        with self.lock:
+            return self.by_id.get(model_id)
+
+    def refresh(self, client):
+        """Revalidate against /models, returning True if the catalog changed"""
+        headers = {}
+        if self.models:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+
+        response = client.list_models(headers=headers)
+
+        if response.status_code == 304:
+            with self.lock:
+                self.fetched_at = time.time()
+            self.save()
+            return False
+
+        if response.status_code != 200:
+            raise ModelCatalogError(f"Failed to fetch models: {response.text}")
+
+        data = response.json()
+        with self.lock:
+            changed = data['data'] != self.models
+            self._set_models(data['data'])
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+            self.fetched_at = time.time()
+        self.save()
+        return changed
+
+    def _set_models(self, models):
+        self.models = models
+        self.by_id = {model['id']: model for model in models}
@@ -0,0 +1,104 @@
+"""
+Automatic fallback to other models when one is down, with a per-model circuit breaker
+"""
+
+import threading
+import time
+
+import requests
+
+# Upstream statuses that say the model (or its providers) failed, not the request or the account
+FALLBACK_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+def is_model_failure(error):
+    """True for errors another model might not have: provider outages, overload, rate limits, timeouts"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        message = getattr(error, "message", "")
+        return status_code in FALLBACK_STATUS_CODES or "No instances available" in message
+    # A read timeout means the model stalled; connection errors would hit every model alike
+    return isinstance(error, requests.exceptions.ReadTimeout)
+
+
+class CircuitBreaker:
+    """Takes a model out of rotation after `failure_threshold` failures in a row.
+
+    The circuit stays open for `cooldown` seconds. After that one trial request
+    is let through (half-open): a success closes the circuit, a failure opens it
+    for another cool-down.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.opened_at = {}
+        self.trials = set()
+
+    def allow(self, model):
+        """Whether a request to the model may go out now; claims the trial slot of a half-open circuit"""
+        with self.lock:
+            opened_at = self.opened_at.get(model)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at < self.cooldown or model in self.trials:
+                return False
+            self.trials.add(model)
+            return True
+
+    def is_open(self, model):
+        with self.lock:
+            opened_at = self.opened_at.get(model)
+            return opened_at is not None and time.monotonic() - opened_at < self.cooldown
+
+    def record_success(self, model):
+        with self.lock:
+            self.failures.pop(model, None)
+            self.opened_at.pop(model, None)
+            self.trials.discard(model)
+
+    def record_failure(self, model):
+        """Count a failure; returns True if this opened (or re-opened) the circuit"""
+        with self.lock:
+            self.failures[model] = self.failures.get(model, 0) + 1
+            half_open = model in self.trials
+            self.trials.discard(model)
+            if half_open or self.failures[model] >= self.failure_threshold:
+                self.opened_at[model] = time.monotonic()
+                return True
+            return False
+
+    def release(self, model):
+        """Give back a half-open trial slot whose request ended without a verdict (e.g. cancelled)"""
+        with self.lock:
+            self.trials.discard(model)
+
+
+class ModelRouter:
+    """Picks the models to try for a request, in order.
+
+    `fallbacks` maps a model id to its ordered fallback list; the "*" entry
+    applies to models without their own. With `rank_by_latency`, fallbacks are
+    reordered by their p50 latency over the last `latency_window` seconds in
+    the metrics store; models without recent data keep their configured order
+    after the measured ones.
+    """
+
+    def __init__(self, fallbacks=None, breaker=None, metrics=None, rank_by_latency=False, latency_window=900):
+        self.fallbacks = fallbacks or {}
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics
+        self.rank_by_latency = rank_by_latency
+        self.latency_window = latency_window
+
+    def candidates(self, model):
+        """The requested model followed by its fallbacks, without duplicates"""
+        fallbacks = [m for m in self.fallbacks.get(model, self.fallbacks.get("*", [])) if m != model]
+        fallbacks = list(dict.fromkeys(fallbacks))
+        if self.rank_by_latency and self.metrics is not None and len(fallbacks) > 1:
+            latencies = self.metrics.recent_latency(fallbacks, self.latency_window)
+            # sorted() is stable, so unmeasured models stay in configured order at the end
+            fallbacks = sorted(fallbacks, key=lambda m: (latencies.get(m) is None, latencies.get(m) or 0))
+        return [model] + fallbacks
@@ -1,39 +1,48 @@
+import time
+
+# Taken before any other import so the startup profile covers import time too
+STARTUP_STARTED = time.perf_counter()
+
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext, messagebox, filedialog, simpledialog
 import requests
 import json
 import os
+import sqlite3
 import threading
 from datetime import datetime
-import re
 import sys
 
-# Suppress audio warnings and handle missing sound cards gracefully
-pyttsx3 = None
-if sys.platform.startswith('linux'):
-    # Check if any sound cards are available
-    try:
-        import subprocess
-        result = subprocess.run(['aplay', '-l'], capture_output=True, text=True)
-        has_sound_card = 'card' in result.stdout.lower()
-    except:
-        has_sound_card = False
-    
-    if has_sound_card:
-        try:
-            import pyttsx3
-        except ImportError:
-            pass
-else:
-    # On non-Linux systems, try to import normally
-    try:
-        import pyttsx3
-    except ImportError:
-        pass
+from chat_renderer import ChatRenderer
+from compare_window import CompareWindow
+from conversation_store import ConversationStore
+from diagnostics import HandlerProfiler, StallWatchdog, innermost_frame
+from event_log import EventLog
+from history_compactor import HistoryCompactor
+from metrics import MetricsStore
+from model_catalog import ModelCatalog
+from model_fallback import CircuitBreaker, ModelRouter
+from openrouter_client import OpenRouterClient, RequestCancelled, api_base_url
+from openrouter_engine import ChatAPIError, ChatEngine
+from request_scheduler import RequestScheduler
+from response_cache import ResponseCache
+from search_window import SearchWindow
+from startup_profile import StartupProfile
+from tts_worker import TTSWorker, load_tts_engine
+from ui_queue import UIEventQueue
+
+IMPORTS_DONE = time.perf_counter()
+
+# Tk-thread handlers that run under cProfile when handler profiling is on; the last three
+# render what request workers post to the UI queue
+PROFILED_HANDLERS = ("send_message", "load_memory", "fetch_models", "switch_conversation", "clear_chat",
+                     "display_message", "end_stream_message", "show_log_lines")
+
 
 class OpenRouterChatbot:
-    def __init__(self, root):
+    def __init__(self, root, profile=None):
         self.root = root
+        self.profile = profile or StartupProfile()
         self.root.title("OpenRouter AI Chat")
         self.root.geometry("1000x700")
         
@@ -48,53 +57,79 @@ class OpenRouterChatbot:
         
         self.root.configure(bg=self.bg_color)
         
-        # Initialize TTS engine only if pyttsx3 is available
-        self.tts_engine = None
-        self.tts_available = False
-        
-        # Skip TTS initialization if pyttsx3 is not available (no sound card)
-        if pyttsx3:
-            if sys.platform.startswith('linux'):
-                # Suppress all output during TTS initialization
-                import io
-                old_stdout = sys.stdout
-                old_stderr = sys.stderr
-                sys.stdout = io.StringIO()
-                sys.stderr = io.StringIO()
-            
-            try:
-                self.tts_engine = pyttsx3.init()
-                self.tts_available = True
-            except Exception:
-                # Silently fail - TTS just won't be available
-                pass
-            finally:
-                if sys.platform.startswith('linux'):
-                    sys.stdout = old_stdout
-                    sys.stderr = old_stderr
+        # TTS is initialized lazily the first time it is enabled; None means not probed yet
+        self.tts = None
+        self.tts_available = None
         
         self.tts_enabled = tk.BooleanVar(value=False)
+        self.stream_enabled = tk.BooleanVar(value=True)
+        self.cache_enabled = tk.BooleanVar(value=False)
+        self.compact_enabled = tk.BooleanVar(value=False)
         
         # Initialize variables
         self.api_key = ""
         self.selected_model = tk.StringVar()
         self.models = []
         self.conversation_history = []
-        self.memory_file = "chat_memory.json"
+        # Set once the store is open; requests are queued per conversation id
+        self.conversation_id = None
+        # Bumped whenever the chat view is cleared or reloaded, so late updates from older replies are dropped
+        self.view_id = 0
+        self.conversations = []
+        self.store = ConversationStore()
         self.config_file = "config.json"
+        self.config = {}
+        self.catalog = ModelCatalog()
+        self.event_log = EventLog()
+        # Worker threads hand all UI work to this queue instead of calling Tk themselves
+        self.ui = UIEventQueue(self.root)
+        self.metrics = MetricsStore(on_record=lambda m: self.ui.post_once(self.update_stats_panel))
+        self.watchdog = None
+        
+        # Wrap before the widgets bind the handlers; the wrappers call straight through until enabled
+        self.handler_profiler = HandlerProfiler(on_report=self.log_handler_profile)
+        for name in PROFILED_HANDLERS:
+            setattr(self, name, self.handler_profiler.wrap(name, getattr(self, name)))
         
         # Create GUI
         self.create_widgets()
+        self.profile.mark("widgets created")
         
         # Load config and memory after GUI is created
         self.load_config()
+        self.configure_diagnostics()
+        self.ui.interval = self.config.get("ui_frame_ms", 16)
+        self.client = self.create_client()
+        self.response_cache = ResponseCache(max_entries=self.config.get("response_cache_max_entries", 200),
+                                            ttl=self.config.get("response_cache_ttl", 86400))
+        self.response_cache.load()
+        self.engine = ChatEngine(self.client, self.catalog, response_cache=self.response_cache,
+                                 metrics=self.metrics)
+        self.router = ModelRouter(
+            fallbacks=self.config.get("model_fallbacks", {}),
+            breaker=CircuitBreaker(failure_threshold=self.config.get("circuit_failure_threshold", 3),
+                                   cooldown=self.config.get("circuit_cooldown", 60.0)),
+            metrics=self.metrics,
+            rank_by_latency=self.config.get("fallback_rank_by_latency", False)
+        )
+        self.scheduler = RequestScheduler(max_workers=self.config.get("max_concurrent_requests", 4))
+        self.compactor = HistoryCompactor(self.engine, self.store, model=self.config.get("compaction_model"),
+                                          keep_recent=self.config.get("compaction_keep_recent", 20),
+                                          batch_size=self.config.get("compaction_batch_size", 20))
+        self.load_cached_models()
+        self.profile.mark("config and caches")
         self.load_memory()
+        self.profile.mark("memory loaded")
         
         # Apply custom styles
         self.style = ttk.Style()
         self.style.theme_use('clam')
         self.configure_styles()
         
+        self.ui.start()
+        if self.watchdog:
+            self.watchdog.start()
+        
     def configure_styles(self):
         # Configure ttk styles for modern look
         self.style.configure("TLabel", background=self.bg_color, foreground=self.fg_color)
@@ -102,6 +137,10 @@ class OpenRouterChatbot:
         self.style.configure("TCombobox", fieldbackground=self.entry_bg, background=self.button_bg, foreground=self.fg_color)
         self.style.configure("TCheckbutton", background=self.bg_color, foreground=self.fg_color)
         self.style.map('TCombobox', fieldbackground=[('readonly', self.entry_bg)])
+        self.style.configure("Treeview", background=self.chat_bg, fieldbackground=self.chat_bg,
+                             foreground="#d4d4d4", font=("Consolas", 9), borderwidth=0)
+        self.style.configure("Treeview.Heading", background=self.button_bg, foreground=self.fg_color,
+                             font=("Arial", 9, "bold"))
         
     def create_widgets(self):
         # Main container
@@ -129,6 +168,37 @@ class OpenRouterChatbot:
         self.save_key_btn.bind("<Enter>", lambda e: self.save_key_btn.config(bg=self.hover_color))
         self.save_key_btn.bind("<Leave>", lambda e: self.save_key_btn.config(bg=self.accent_color))
         
+        # Conversation Section
+        conversation_frame = ttk.Frame(settings_frame, style="TFrame")
+        conversation_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(conversation_frame, text="Conversation:", style="TLabel").pack(side=tk.LEFT, padx=(0, 5))
+        
+        self.conversation_dropdown = ttk.Combobox(conversation_frame, state="readonly", width=40)
+        self.conversation_dropdown.pack(side=tk.LEFT, padx=(0, 10))
+        self.conversation_dropdown.bind("<<ComboboxSelected>>", self.on_conversation_selected)
+        
+        for text, command in (("New", self.new_conversation), ("Rename", self.rename_conversation),
+                              ("Delete", self.delete_conversation)):
+            button = tk.Button(conversation_frame, text=text, command=command,
+                               bg=self.button_bg, fg=self.fg_color, bd=0, padx=10, pady=3,
+                               font=("Arial", 9), cursor="hand2")
+            button.pack(side=tk.LEFT, padx=(0, 5))
+            button.bind("<Enter>", lambda e, b=button: b.config(bg="#4a4a4a"))
+            button.bind("<Leave>", lambda e, b=button: b.config(bg=self.button_bg))
+        
+        self.search_btn = tk.Button(conversation_frame, text="Search", command=self.open_search,
+                                    bg=self.button_bg, fg=self.fg_color, bd=0, padx=10, pady=3,
+                                    font=("Arial", 9), cursor="hand2")
+        self.search_btn.pack(side=tk.RIGHT)
+        self.search_btn.bind("<Enter>", lambda e: self.search_btn.config(bg="#4a4a4a"))
+        self.search_btn.bind("<Leave>", lambda e: self.search_btn.config(bg=self.button_bg))
+        
+        self.search_entry = tk.Entry(conversation_frame, bg=self.entry_bg, fg=self.fg_color,
+                                     insertbackground=self.fg_color, bd=0, font=("Arial", 10), width=30)
+        self.search_entry.pack(side=tk.RIGHT, padx=(0, 5))
+        self.search_entry.bind("<Return>", lambda e: self.open_search())
+        
         # Model Selection and TTS Frame
         model_tts_frame = ttk.Frame(settings_frame, style="TFrame")
         model_tts_frame.pack(fill=tk.X)
@@ -145,13 +215,29 @@ class OpenRouterChatbot:
         self.model_dropdown.bind("<<ComboboxSelected>>", lambda e: self.save_config())
         
         # TTS Toggle
-        tts_text = "Enable Text-to-Speech" if self.tts_available else "Text-to-Speech (unavailable)"
-        self.tts_check = ttk.Checkbutton(model_tts_frame, text=tts_text, 
+        self.tts_check = ttk.Checkbutton(model_tts_frame, text="Enable Text-to-Speech", 
                                          variable=self.tts_enabled, style="TCheckbutton",
-                                         state="normal" if self.tts_available else "disabled",
-                                         command=self.save_config)
+                                         command=self.on_tts_toggled)
         self.tts_check.pack(side=tk.LEFT)
         
+        # Streaming Toggle
+        self.stream_check = ttk.Checkbutton(model_tts_frame, text="Stream responses",
+                                            variable=self.stream_enabled, style="TCheckbutton",
+                                            command=self.save_config)
+        self.stream_check.pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Response Cache Toggle
+        self.cache_check = ttk.Checkbutton(model_tts_frame, text="Cache responses",
+                                           variable=self.cache_enabled, style="TCheckbutton",
+                                           command=self.save_config)
+        self.cache_check.pack(side=tk.LEFT, padx=(10, 0))
+        
+        # History Compaction Toggle
+        self.compact_check = ttk.Checkbutton(model_tts_frame, text="Summarize old turns",
+                                             variable=self.compact_enabled, style="TCheckbutton",
+                                             command=self.save_config)
+        self.compact_check.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Chat Display
         chat_frame = ttk.Frame(main_frame, style="TFrame")
         chat_frame.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
@@ -169,6 +255,9 @@ class OpenRouterChatbot:
         self.chat_display.tag_config("timestamp", foreground="#858585", font=("Arial", 8))
         self.chat_display.tag_config("thinking", foreground="#d4d4d4", font=("Arial", 10, "italic"), background="#2d2d2d")
         
+        # Only a window of the conversation is kept in the widget at a time
+        self.renderer = ChatRenderer(self.chat_display, lambda: self.conversation_history)
+        
         # Input Frame
         input_frame = ttk.Frame(main_frame, style="TFrame")
         input_frame.pack(fill=tk.X, pady=(10, 0))
@@ -179,6 +268,8 @@ class OpenRouterChatbot:
         self.message_entry.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
         self.message_entry.bind("<Return>", self.send_message_event)
         self.message_entry.bind("<Shift-Return>", lambda e: None)
+        # Ctrl+Enter sends without consulting the response cache
+        self.message_entry.bind("<Control-Return>", lambda e: self.send_message(bypass_cache=True) or "break")
         
         # Button Frame
         button_frame = ttk.Frame(input_frame, style="TFrame")
@@ -191,6 +282,13 @@ class OpenRouterChatbot:
         self.send_btn.bind("<Enter>", lambda e: self.send_btn.config(bg=self.hover_color))
         self.send_btn.bind("<Leave>", lambda e: self.send_btn.config(bg=self.accent_color))
         
+        self.stop_btn = tk.Button(button_frame, text="Stop", command=self.stop_response,
+                                  bg=self.button_bg, fg=self.fg_color, bd=0, padx=20, pady=5,
+                                  font=("Arial", 10), cursor="hand2")
+        self.stop_btn.pack(pady=(0, 5))
+        self.stop_btn.bind("<Enter>", lambda e: self.stop_btn.config(bg="#4a4a4a"))
+        self.stop_btn.bind("<Leave>", lambda e: self.stop_btn.config(bg=self.button_bg))
+        
         self.clear_btn = tk.Button(button_frame, text="Clear", command=self.clear_chat,
                                   bg=self.button_bg, fg=self.fg_color, bd=0, padx=20, pady=5,
                                   font=("Arial", 10), cursor="hand2")
@@ -198,9 +296,20 @@ class OpenRouterChatbot:
         self.clear_btn.bind("<Enter>", lambda e: self.clear_btn.config(bg="#4a4a4a"))
         self.clear_btn.bind("<Leave>", lambda e: self.clear_btn.config(bg=self.button_bg))
         
+        self.compare_btn = tk.Button(button_frame, text="Compare", command=self.open_compare,
+                                     bg=self.button_bg, fg=self.fg_color, bd=0, padx=20, pady=5,
+                                     font=("Arial", 10), cursor="hand2")
+        self.compare_btn.pack(pady=(5, 0))
+        self.compare_btn.bind("<Enter>", lambda e: self.compare_btn.config(bg="#4a4a4a"))
+        self.compare_btn.bind("<Leave>", lambda e: self.compare_btn.config(bg=self.button_bg))
+        
+        # Log and Stats Frame
+        bottom_frame = ttk.Frame(main_frame, style="TFrame")
+        bottom_frame.pack(fill=tk.X, pady=(10, 0))
+        
         # Log Window Frame
-        log_frame = ttk.Frame(main_frame, style="TFrame")
-        log_frame.pack(fill=tk.X, pady=(10, 0))
+        log_frame = ttk.Frame(bottom_frame, style="TFrame")
+        log_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
         
         ttk.Label(log_frame, text="System Log:", style="TLabel").pack(anchor=tk.W)
         
@@ -211,6 +320,27 @@ class OpenRouterChatbot:
         self.log_display.pack(fill=tk.X)
         self.log_display.config(state=tk.DISABLED)
         
+        # Stats Panel
+        stats_frame = ttk.Frame(bottom_frame, style="TFrame")
+        stats_frame.pack(side=tk.LEFT, fill=tk.Y)
+        
+        stats_header = ttk.Frame(stats_frame, style="TFrame")
+        stats_header.pack(fill=tk.X)
+        ttk.Label(stats_header, text="Request Stats:", style="TLabel").pack(side=tk.LEFT)
+        for text, command in (("JSON", self.export_metrics_json), ("CSV", self.export_metrics_csv)):
+            tk.Button(stats_header, text=text, command=command, bg=self.button_bg, fg=self.fg_color,
+                      bd=0, padx=8, font=("Arial", 8), cursor="hand2").pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Label(stats_header, text="Export:", style="TLabel").pack(side=tk.RIGHT)
+        
+        columns = ("requests", "latency", "ttft", "tps")
+        self.stats_tree = ttk.Treeview(stats_frame, columns=columns, height=5)
+        self.stats_tree.heading("#0", text="Model")
+        self.stats_tree.column("#0", width=180)
+        for column, heading in zip(columns, ("Reqs", "Latency p50/p95", "TTFT p50/p95", "Tok/s p50")):
+            self.stats_tree.heading(column, text=heading)
+            self.stats_tree.column(column, width=50 if column == "requests" else 105, anchor=tk.E)
+        self.stats_tree.pack(fill=tk.BOTH, expand=True)
+        
         # Configure log tags
         self.log_display.tag_config("error", foreground="#f48771")
         self.log_display.tag_config("warning", foreground="#dcdcaa")
@@ -219,34 +349,110 @@ class OpenRouterChatbot:
         
         # Initial log message
         self.log_message("Application started", "SUCCESS")
-        if not self.tts_available:
-            self.log_message("TTS unavailable - install espeak for TTS support", "WARNING")
         
     def log_message(self, message, level="INFO"):
-        """Add a message to the log window"""
+        """Add a message to the log window and the structured event log"""
+        self.event_log.log(message, level)
+        self.show_log_lines([(datetime.now(), message, level)])
+        
+    def show_log_lines(self, lines):
+        """Append (time, message, level) lines to the log window with a single insert"""
+        chunks = []
+        for logged_at, message, level in lines:
+            # Color coding for different log levels
+            if level not in ("ERROR", "WARNING", "SUCCESS"):
+                level = "INFO"
+            chunks += [f"[{logged_at:%H:%M:%S}] {level}: ", level.lower(), f"{message}\n", ""]
+        
         self.log_display.config(state=tk.NORMAL)
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        # Color coding for different log levels
-        if level == "ERROR":
-            self.log_display.insert(tk.END, f"[{timestamp}] ERROR: ", "error")
-        elif level == "WARNING":
-            self.log_display.insert(tk.END, f"[{timestamp}] WARNING: ", "warning")
-        elif level == "SUCCESS":
-            self.log_display.insert(tk.END, f"[{timestamp}] SUCCESS: ", "success")
-        else:
-            self.log_display.insert(tk.END, f"[{timestamp}] INFO: ", "info")
+        self.log_display.insert(tk.END, *chunks)
+        
+        # Keep the on-screen log a bounded ring buffer; the full history is in the event log file
+        max_lines = self.config.get("log_max_lines", 500)
+        line_count = int(self.log_display.index("end-1c").split(".")[0]) - 1
+        if line_count > max_lines:
+            self.log_display.delete("1.0", f"{line_count - max_lines + 1}.0")
         
-        self.log_display.insert(tk.END, f"{message}\n")
         self.log_display.config(state=tk.DISABLED)
         self.log_display.see(tk.END)
         
+    def configure_diagnostics(self):
+        """Turn on the stall watchdog and handler profiling if the command line, environment or config asks"""
+        if ("--watchdog" in sys.argv or os.environ.get("OPENROUTER_WATCHDOG")
+                or self.config.get("watchdog_enabled", False)):
+            self.watchdog = StallWatchdog(self.root,
+                                          threshold=self.config.get("watchdog_threshold_ms", 200) / 1000,
+                                          dump_file=self.config.get("stall_dump_file", "ui_stalls.log"),
+                                          on_stall=self.log_stall)
+            self.log_message(f"Stall watchdog on, reporting Tk stalls over {self.watchdog.threshold * 1000:.0f} ms")
+        
+        if ("--profile-handlers" in sys.argv or os.environ.get("OPENROUTER_PROFILE_HANDLERS")
+                or self.config.get("profile_handlers", False)):
+            self.handler_profiler.enabled = True
+            self.handler_profiler.report_threshold = self.config.get("profile_report_ms", 100) / 1000
+            self.log_message(f"Profiling handlers: {', '.join(PROFILED_HANDLERS)}")
+    
+    def log_stall(self, duration, stack):
+        self.log_message(f"UI stalled for {duration * 1000:.0f} ms in {innermost_frame(stack)} "
+                         f"(stack in {self.watchdog.dump_file})", "WARNING")
+    
+    def log_handler_profile(self, name, duration, top):
+        hotspots = ", ".join(f"{label} {seconds * 1000:.0f} ms" for label, seconds in top[:3])
+        self.log_message(f"{name} took {duration * 1000:.0f} ms: {hotspots}", "WARNING")
+    
+    def create_client(self):
+        """Build the pooled HTTP client, taking the API base, timeouts and retries from config.json"""
+        def on_retry(attempt, delay, reason):
+            self.post_log(f"Request failed ({reason}), retry {attempt} in {delay:.1f}s", "WARNING")
+        
+        return OpenRouterClient(
+            api_key=self.api_key,
+            base_url=api_base_url(self.config),
+            connect_timeout=self.config.get("connect_timeout", 5.0),
+            read_timeout=self.config.get("read_timeout", 120.0),
+            max_retries=self.config.get("max_retries", 3),
+            on_retry=on_retry
+        )
+    
+    def update_stats_panel(self):
+        """Refresh the per-model p50/p95 table from the metrics store"""
+        def seconds(p50, p95):
+            if p50 is None:
+                return "-"
+            return f"{p50:.2f}/{p95:.2f}s"
+        
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        for model, stats in sorted(self.metrics.summary().items()):
+            tps = stats["tokens_per_second_p50"]
+            requests_text = f"{stats['requests']}" + (f" ({stats['errors']}!)" if stats["errors"] else "")
+            self.stats_tree.insert("", tk.END, text=model, values=(
+                requests_text,
+                seconds(stats["latency_p50"], stats["latency_p95"]),
+                seconds(stats["ttft_p50"], stats["ttft_p95"]),
+                "-" if tps is None else f"{tps:.1f}"
+            ))
+    
+    def export_metrics_csv(self):
+        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")],
+                                            initialfile="request_metrics.csv")
+        if path:
+            self.metrics.export_csv(path)
+            self.log_message(f"Metrics exported to {path}", "SUCCESS")
+    
+    def export_metrics_json(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")],
+                                            initialfile="request_metrics.json")
+        if path:
+            self.metrics.export_json(path)
+            self.log_message(f"Metrics exported to {path}", "SUCCESS")
+    
     def save_api_key(self):
         self.api_key = self.api_key_entry.get()
+        self.client.api_key = self.api_key
         if self.api_key:
             self.log_message("Saving API key...")
             self.save_config()
-            self.fetch_models()
+            self.fetch_models(force=True)
             self.log_message("API key saved successfully", "SUCCESS")
             messagebox.showinfo("Success", "API Key saved successfully!")
         else:
@@ -254,19 +460,24 @@ class OpenRouterChatbot:
             messagebox.showwarning("Warning", "Please enter an API key")
     
     def save_config(self):
-        config_data = {
+        # Update in place so hand-edited settings (timeouts, retries) survive a save
+        self.config.update({
             "api_key": self.api_key,
             "last_model": self.selected_model.get(),
-            "tts_enabled": self.tts_enabled.get()
-        }
+            "tts_enabled": self.tts_enabled.get(),
+            "stream_enabled": self.stream_enabled.get(),
+            "cache_enabled": self.cache_enabled.get(),
+            "compaction_enabled": self.compact_enabled.get()
+        })
         with open(self.config_file, 'w') as f:
-            json.dump(config_data, f, indent=2)
+            json.dump(self.config, f, indent=2)
     
     def load_config(self):
         if os.path.exists(self.config_file):
             try:
                 with open(self.config_file, 'r') as f:
                     config_data = json.load(f)
+                    self.config = config_data
                     self.api_key = config_data.get("api_key", "")
                     
                     # Set the API key in entry field after GUI is created
@@ -287,43 +498,60 @@ class OpenRouterChatbot:
         
         # Set TTS preference
         self.tts_enabled.set(config_data.get("tts_enabled", False))
+        if self.tts_enabled.get():
+            self.ensure_tts()
+        self.stream_enabled.set(config_data.get("stream_enabled", True))
+        self.cache_enabled.set(config_data.get("cache_enabled", False))
+        self.compact_enabled.set(config_data.get("compaction_enabled", False))
+    
+    def load_cached_models(self):
+        """Fill the model dropdown from the on-disk catalog without touching the network"""
+        self.catalog.ttl = self.config.get("model_cache_ttl", 3600)
+        if self.catalog.load():
+            self.update_model_dropdown()
+            self.log_message(f"Loaded {len(self.models)} models from cache")
     
-    def fetch_models(self):
+    def fetch_models(self, force=False):
+        """Refresh the model catalog on a background thread if the cache is stale"""
+        if not force and not self.catalog.is_stale():
+            self.log_message("Model list is up to date")
+            return
+        
+        self.log_message("Fetching available models from OpenRouter...")
+        threading.Thread(target=self.refresh_models, daemon=True).start()
+    
+    def refresh_models(self):
         try:
-            self.log_message("Fetching available models from OpenRouter...")
-            headers = {
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            response = requests.get("https://openrouter.ai/api/v1/models", headers=headers)
-            
-            if response.status_code == 200:
-                data = response.json()
-                self.models = [model['id'] for model in data['data']]
-                self.model_dropdown['values'] = self.models
-                self.log_message(f"Successfully fetched {len(self.models)} models", "SUCCESS")
-                
-                # Try to preserve the selected model if it still exists
-                current_model = self.selected_model.get()
-                if current_model in self.models:
-                    self.selected_model.set(current_model)
-                elif self.models:
-                    self.selected_model.set(self.models[0])
-                    self.log_message(f"Selected model: {self.models[0]}")
+            if self.catalog.refresh(self.client):
+                self.ui.post(self.update_model_dropdown)
+                self.post_log(f"Successfully fetched {len(self.catalog.models)} models", "SUCCESS")
             else:
-                error_msg = f"Failed to fetch models: {response.text}"
-                self.log_message(error_msg, "ERROR")
-                messagebox.showerror("Error", error_msg)
+                self.post_log("Model list unchanged since last fetch")
         except Exception as e:
             error_msg = f"Error fetching models: {str(e)}"
-            self.log_message(error_msg, "ERROR")
-            messagebox.showerror("Error", error_msg)
+            self.post_log(error_msg, "ERROR")
+            # A cached list is still usable, so only interrupt the user when there is nothing to show
+            if not self.catalog.models:
+                self.ui.post(messagebox.showerror, "Error", error_msg)
+    
+    def update_model_dropdown(self):
+        self.models = self.catalog.ids()
+        self.model_dropdown['values'] = self.models
+        
+        # Try to preserve the selected model if it still exists
+        current_model = self.selected_model.get() or self.config.get("last_model", "")
+        if current_model in self.models:
+            self.selected_model.set(current_model)
+        elif self.models:
+            self.selected_model.set(self.models[0])
+            self.log_message(f"Selected model: {self.models[0]}")
     
     def send_message_event(self, event):
         if not event.state & 0x1:  # Check if Shift is not pressed
             self.send_message()
             return "break"
     
-    def send_message(self):
+    def send_message(self, bypass_cache=False):
         message = self.message_entry.get("1.0", tk.END).strip()
         if not message:
             return
@@ -341,6 +569,23 @@ class OpenRouterChatbot:
         # Clear input
         self.message_entry.delete("1.0", tk.END)
         
+        # A new question interrupts whatever is still being read out
+        self.stop_speech()
+        
+        waiting = self.scheduler.pending(self.conversation_id)
+        if waiting:
+            self.log_message(f"Message queued behind {waiting} pending request(s)")
+        
+        # Requests for a conversation run one at a time, in the order they were sent
+        conversation_id = self.conversation_id
+        self.scheduler.submit(conversation_id,
+                              lambda token: self.get_ai_response(message, conversation_id, bypass_cache, token))
+    
+    def begin_turn(self, message):
+        """Show and record a user message once its request is about to be sent.
+        
+        Returns the settings for the turn, read here because the worker must not touch Tk variables.
+        """
         # Display user message
         self.display_message("You", message, "user")
         
@@ -350,199 +595,423 @@ class OpenRouterChatbot:
         # Log the request
         self.log_message(f"Sending message to {self.selected_model.get()}")
         
-        # Send request in thread
-        threading.Thread(target=self.get_ai_response, args=(message,), daemon=True).start()
+        return {
+            "view": self.view_id,
+            "history": self.conversation_history,
+            "model": self.selected_model.get(),
+            "stream": self.stream_enabled.get(),
+            "use_cache": self.cache_enabled.get(),
+            "compact": self.compact_enabled.get(),
+            # The worker itself, since _tts_loaded may reset self.tts while the reply streams
+            "tts": self.tts if self.tts_active() else None
+        }
+    
+    def stop_response(self):
+        """Abort the reply in progress and drop any queued messages"""
+        self.stop_speech()
+        cancelled = self.scheduler.cancel(self.conversation_id)
+        if cancelled:
+            self.log_message(f"Stopped {cancelled} request(s)", "WARNING")
+    
+    def run_on_ui(self, func, *args, cancel_token=None):
+        """Run func on the Tk thread and wait for it; returns its result, or None if cancelled before it ran"""
+        done = threading.Event()
+        state = {"result": None}
+        
+        def run():
+            try:
+                if not (cancel_token and cancel_token.cancelled):
+                    state["result"] = func(*args)
+            finally:
+                # An exception is reported by the queue; the worker then gives up on the turn
+                done.set()
+        
+        self.ui.post(run)
+        while not done.wait(0.1):
+            if cancel_token and cancel_token.cancelled:
+                return None
+        return state["result"]
+    
+    def open_compare(self):
+        """Open the multi-model comparison window with the current draft as the prompt"""
+        if not self.api_key:
+            self.log_message("No API key set", "WARNING")
+            messagebox.showwarning("Warning", "Please set your API key first")
+            return
+        
+        CompareWindow(self, self.message_entry.get("1.0", tk.END).strip())
     
-    def get_ai_response(self, message):
+    def get_ai_response(self, message, conversation_id, bypass_cache=False, cancel_token=None):
+        # The history only changes on the Tk thread; taking the turn there means this message
+        # lands after the previous reply, which has already been appended by now
+        settings = self.run_on_ui(self.begin_turn, message, cancel_token=cancel_token)
+        if settings is None:
+            return
+        
+        # Which parts of the reply have started streaming into the chat
+        stream = {"thinking": False, "answer": False}
+        tts = settings["tts"]
+        view = settings["view"]
+        
+        def on_thinking(text):
+            if stream["answer"]:
+                # A later thinking block goes inline in the answer it interrupts
+                self.ui.post_text(self.update_view, view, self.append_stream_text, text=text, tag="thinking")
+                return
+            if not stream["thinking"]:
+                self.ui.post(self.update_view, view, self.begin_thinking_message, "Assistant (thinking)")
+                stream["thinking"] = True
+            self.ui.post_text(self.update_view, view, self.append_thinking_text, text=text)
+        
+        def on_delta(text):
+            if not stream["answer"]:
+                if stream["thinking"]:
+                    self.ui.post(self.update_view, view, self.end_thinking_message)
+                self.ui.post(self.update_view, view, self.begin_stream_message, "Assistant", "assistant")
+                stream["answer"] = True
+            self.ui.post_text(self.update_view, view, self.append_stream_text, text=text)
+            if tts is not None:
+                tts.feed(text)
+        
         try:
-            self.root.after(0, self.log_message, "Preparing API request...")
+            self.post_log("Preparing API request...")
             
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            # Persist the user message from the worker so disk I/O stays off the Tk thread
+            self.save_memory({"role": "user", "content": message}, conversation_id, settings["model"])
+            # The conversation moves to the top of the list (and gets a title from its first message)
+            self.ui.post(self.refresh_conversation_list)
             
-            # Prepare messages with context
-            messages = self.conversation_history[-10:]  # Last 10 messages for context
+            # Older turns are replaced by their rolling summary when compaction is on
+            summary = self.compactor.summary_for(conversation_id) if settings["compact"] else None
             
-            data = {
-                "model": self.selected_model.get(),
-                "messages": messages
-            }
+            def build_payload(model):
+                return self.engine.build_payload(settings["history"], model, on_log=self.post_log,
+                                                 summary=summary, system_prompt=self.config.get("system_prompt"),
+                                                 prompt_cache=self.config.get("prompt_caching", True))
             
-            self.root.after(0, self.log_message, f"Sending request to OpenRouter API...")
+            # Provider failures move on to the model's configured fallbacks in the background
+            result = self.engine.complete_with_fallback(
+                build_payload, settings["model"], self.router,
+                fallback_retries=self.config.get("fallback_max_retries", 1),
+                stream=settings["stream"], use_cache=settings["use_cache"], bypass_cache=bypass_cache,
+                on_log=self.post_log, on_delta=on_delta, on_thinking=on_thinking, cancel_token=cancel_token)
             
-            # First try without streaming to get proper error messages
-            response = requests.post("https://openrouter.ai/api/v1/chat/completions", 
-                                   headers=headers, json=data, stream=False)
+            # Stopped just as the reply completed: treat it like any other stopped reply
+            if cancel_token and cancel_token.cancelled:
+                raise RequestCancelled("Request cancelled")
             
-            if response.status_code == 200:
-                self.root.after(0, self.log_message, "Response received, processing...", "SUCCESS")
-                
-                result = response.json()
-                full_response = result['choices'][0]['message']['content']
-                
-                # Check for thinking tags in the response
-                thinking_content = None
-                display_response = full_response
-                
-                if '<thinking>' in full_response and '</thinking>' in full_response:
-                    # Extract thinking content
-                    import re
-                    thinking_match = re.search(r'<thinking>(.*?)</thinking>', full_response, re.DOTALL)
-                    if thinking_match:
-                        thinking_content = thinking_match.group(1).strip()
-                        self.root.after(0, self.log_message, "Model thinking process detected", "INFO")
-                        # Remove thinking tags from the displayed response
-                        display_response = re.sub(r'<thinking>.*?</thinking>', '', full_response, flags=re.DOTALL).strip()
-                
-                # Log success
-                self.root.after(0, self.log_message, "Response received successfully", "SUCCESS")
-                
-                # Display thinking process if present
-                if thinking_content:
-                    self.root.after(0, self.display_thinking, "Assistant (thinking)", thinking_content)
-                
-                # Display actual response
-                self.root.after(0, self.display_message, "Assistant", display_response, "assistant")
-                
-                # Save full response (without thinking tags) to history
-                self.conversation_history.append({"role": "assistant", "content": display_response})
-                
-                # Save to memory
-                self.save_memory()
-                
-                # TTS if enabled
-                if self.tts_enabled.get():
-                    self.root.after(0, self.log_message, "Starting TTS...")
-                    threading.Thread(target=self.speak_text, args=(full_response,), daemon=True).start()
-            else:
-                # Parse error response
-                error_data = response.json()
-                error_msg = "Unknown error"
-                
-                if 'error' in error_data:
-                    error_info = error_data['error']
-                    error_msg = error_info.get('message', 'Unknown error')
-                    
-                    # Log detailed error info
-                    self.root.after(0, self.log_message, f"API Error {response.status_code}: {error_msg}", "ERROR")
-                    
-                    if 'metadata' in error_info:
-                        metadata = error_info['metadata']
-                        if 'raw' in metadata:
-                            self.root.after(0, self.log_message, f"Raw error: {metadata['raw']}", "ERROR")
-                        if 'provider_name' in metadata:
-                            self.root.after(0, self.log_message, f"Provider: {metadata['provider_name']}", "ERROR")
-                    
-                    # Check for specific error types
-                    if "No instances available" in error_msg:
-                        self.root.after(0, self.log_message, 
-                                      "This model may not exist or is currently unavailable. Try selecting a different model.", 
-                                      "WARNING")
-                
-                self.root.after(0, messagebox.showerror, "API Error", 
-                               f"Error {response.status_code}: {error_msg}\n\nPlease check the log for details.")
+            self.display_result(result, stream, view)
+            self.finish_response(result, conversation_id, settings, spoken=tts is not None and stream["answer"])
+        except RequestCancelled:
+            if stream["thinking"] or stream["answer"]:
+                self.ui.post(self.update_view, view, self.end_stream_message, True)
+            self.post_log("Response stopped", "WARNING")
+        except ChatAPIError as e:
+            if stream["thinking"] or stream["answer"]:
+                self.ui.post(self.update_view, view, self.end_stream_message, True)
+            if tts is not None:
+                tts.flush()
+            self.handle_api_error(e.status_code, e.error_data)
         except requests.exceptions.RequestException as e:
+            if stream["thinking"] or stream["answer"]:
+                self.ui.post(self.update_view, view, self.end_stream_message, True)
+            if tts is not None:
+                tts.flush()
             error_msg = f"Network error: {str(e)}"
-            self.root.after(0, self.log_message, error_msg, "ERROR")
-            self.root.after(0, messagebox.showerror, "Network Error", error_msg)
+            self.post_log(error_msg, "ERROR")
+            self.ui.post(messagebox.showerror, "Network Error", error_msg)
         except Exception as e:
             error_msg = f"Unexpected error: {str(e)}"
-            self.root.after(0, self.log_message, error_msg, "ERROR")
-            self.root.after(0, messagebox.showerror, "Error", error_msg)
+            self.post_log(error_msg, "ERROR")
+            self.ui.post(messagebox.showerror, "Error", error_msg)
     
-    def speak_text(self, text):
-        if not self.tts_available or not self.tts_engine:
+    def post_log(self, message, level="INFO"):
+        """log_message for worker threads; lines logged within one frame are written together"""
+        self.event_log.log(message, level)
+        self.ui.post_item(self.show_log_lines, (datetime.now(), message, level))
+    
+    def display_result(self, result, stream, view):
+        """Show a completed response in the chat view it was requested from, finishing whatever part was streamed"""
+        thinking_content = result["thinking"]
+        display_response = result["answer"]
+        sender = "Assistant (cached)" if result["cached"] else "Assistant"
+        
+        if stream["answer"]:
+            self.ui.post(self.update_view, view, self.end_stream_message)
             return
         
-        try:
-            # Clean text for TTS
-            clean_text = re.sub(r'[*_`#]', '', text)
-            self.tts_engine.say(clean_text)
-            self.tts_engine.runAndWait()
-        except Exception as e:
-            print(f"TTS error: {e}")
+        if stream["thinking"]:
+            # Only thinking streamed (e.g. an empty answer), so close its box
+            self.ui.post(self.update_view, view, self.end_stream_message)
+        elif thinking_content:
+            # Display thinking process if present
+            self.ui.post(self.update_view, view, self.display_thinking, "Assistant (thinking)", thinking_content)
+        # Every reply gets a message entry so the chat stays in step with history
+        self.ui.post(self.update_view, view, self.display_message, sender, display_response, "assistant")
     
-    def display_message(self, sender, message, tag):
-        self.chat_display.config(state=tk.NORMAL)
+    def finish_response(self, result, conversation_id, settings, spoken=False):
+        """Record a completed response in history and memory, then hand it to TTS.
+        
+        `settings` are the turn's settings from begin_turn. `spoken` means the reply
+        was already fed to TTS sentence by sentence while streaming.
+        """
+        # Save full response (without thinking tags) to history
+        assistant_message = {"role": "assistant", "content": result["answer"]}
+        # Append on the Tk thread, after the message is displayed, so the renderer's view of history stays in step;
+        # if another conversation was opened meanwhile, the reply is only in the store
+        self.ui.post(self.update_view, settings["view"], self.append_history, assistant_message)
+        
+        # Save to memory
+        self.save_memory(assistant_message, conversation_id, settings["model"])
+        
+        if settings["compact"]:
+            # Queued after the append above, so the compactor sees the reply
+            self.ui.post(self.compact_history, conversation_id)
+        
+        # TTS if enabled
+        tts = settings["tts"]
+        if spoken:
+            tts.flush()
+        elif tts is not None:
+            self.post_log("Starting TTS...")
+            tts.speak(result["answer"])
+    
+    def update_view(self, view, func, *args, **kwargs):
+        """Run a reply's update of the chat view unless the view was cleared or reloaded since the turn began"""
+        if view == self.view_id:
+            func(*args, **kwargs)
+    
+    def append_history(self, message):
+        self.conversation_history.append(message)
+    
+    def compact_history(self, conversation_id):
+        """Summarize older turns in the background once enough have built up"""
+        if conversation_id != self.conversation_id:
+            return
+        self.compactor.maybe_compact(conversation_id, self.conversation_history, self.selected_model.get(),
+                                     on_log=self.post_log)
+    
+    def handle_api_error(self, status_code, error_data):
+        """Log an OpenRouter error payload and show it to the user"""
+        error_msg = "Unknown error"
         
-        # Add timestamp
-        timestamp = datetime.now().strftime("%H:%M")
-        self.chat_display.insert(tk.END, f"[{timestamp}] ", "timestamp")
+        if 'error' in error_data:
+            error_info = error_data['error']
+            error_msg = error_info.get('message', 'Unknown error')
+            
+            # Log detailed error info
+            self.post_log(f"API Error {status_code}: {error_msg}", "ERROR")
+            
+            if 'metadata' in error_info:
+                metadata = error_info['metadata'] or {}
+                if 'raw' in metadata:
+                    self.post_log(f"Raw error: {metadata['raw']}", "ERROR")
+                if 'provider_name' in metadata:
+                    self.post_log(f"Provider: {metadata['provider_name']}", "ERROR")
+            
+            # Check for specific error types
+            if "No instances available" in error_msg:
+                self.post_log("This model may not exist or is currently unavailable. Try selecting a different model, "
+                              "or list fallbacks for it under model_fallbacks in config.json.", "WARNING")
+        
+        self.ui.post(messagebox.showerror, "API Error",
+                     f"Error {status_code}: {error_msg}\n\nPlease check the log for details.")
+    
+    def on_tts_toggled(self):
+        if self.tts_enabled.get():
+            self.ensure_tts()
+        else:
+            self.stop_speech()
+        self.save_config()
+    
+    def ensure_tts(self):
+        """Start the TTS worker in the background unless it is running or known to be unavailable"""
+        if self.tts_available is False or self.tts is not None:
+            return
         
-        # Add sender and message
-        self.chat_display.insert(tk.END, f"{sender}: ", tag)
-        self.chat_display.insert(tk.END, f"{message}\n\n")
+        self.log_message("Initializing text-to-speech...")
+        started = time.perf_counter()
+        self.tts = TTSWorker(load_tts_engine, on_ready=lambda ok: self.ui.post(
+            self._tts_loaded, ok, time.perf_counter() - started))
+        self.tts.start()
+    
+    def _tts_loaded(self, available, duration):
+        self.tts_available = available
         
-        self.chat_display.config(state=tk.DISABLED)
-        self.chat_display.see(tk.END)
+        if available:
+            self.log_message(f"Text-to-speech ready ({duration * 1000:.0f} ms)", "SUCCESS")
+        else:
+            self.tts = None
+            self.tts_enabled.set(False)
+            self.tts_check.config(text="Text-to-Speech (unavailable)", state="disabled")
+            self.log_message("TTS unavailable - install espeak for TTS support", "WARNING")
+    
+    def tts_active(self):
+        return self.tts is not None and self.tts_enabled.get()
+    
+    def stop_speech(self):
+        if self.tts is not None:
+            self.tts.cancel()
+    
+    def display_message(self, sender, message, tag):
+        self.renderer.render_message(sender, message, tag, history=tag in ("user", "assistant"))
+    
+    def begin_stream_message(self, sender, tag):
+        """Start an assistant message that will be filled in by append_stream_text"""
+        self.renderer.begin_stream(sender, tag)
+    
+    def append_stream_text(self, text, tag=None):
+        self.renderer.append_stream(text, tag)
+    
+    def end_stream_message(self, aborted=False):
+        self.renderer.end_stream(aborted)
+    
+    def begin_thinking_message(self, sender):
+        """Start a thinking box that will be filled in by append_thinking_text"""
+        self.renderer.begin_thinking_stream(sender)
+    
+    def append_thinking_text(self, text):
+        self.renderer.append_thinking(text)
+    
+    def end_thinking_message(self):
+        self.renderer.end_thinking_stream()
     
     def display_thinking(self, sender, thinking_content):
         """Display thinking process in a special format"""
-        self.chat_display.config(state=tk.NORMAL)
-        
-        # Add timestamp
-        timestamp = datetime.now().strftime("%H:%M")
-        self.chat_display.insert(tk.END, f"[{timestamp}] ", "timestamp")
-        
-        # Add thinking header
-        self.chat_display.insert(tk.END, f"{sender}:\n", "thinking")
-        
-        # Add thinking content in a box
-        self.chat_display.insert(tk.END, "┌─ Thinking Process ─────────────────────────────────\n", "thinking")
-        
-        # Process and display thinking content with proper indentation
-        lines = thinking_content.split('\n')
-        for line in lines:
-            self.chat_display.insert(tk.END, "│ ", "thinking")
-            self.chat_display.insert(tk.END, f"{line}\n", "thinking")
-        
-        self.chat_display.insert(tk.END, "└────────────────────────────────────────────────────\n\n", "thinking")
-        
-        self.chat_display.config(state=tk.DISABLED)
-        self.chat_display.see(tk.END)
+        self.renderer.render_thinking(sender, thinking_content)
     
     def clear_chat(self):
-        self.chat_display.config(state=tk.NORMAL)
-        self.chat_display.delete("1.0", tk.END)
-        self.chat_display.config(state=tk.DISABLED)
+        self.stop_response()
+        self.view_id += 1
+        self.renderer.reset()
         self.conversation_history = []
-        self.save_memory()
+        self.compactor.forget(self.conversation_id)
+        self.store.clear(self.conversation_id)
         self.display_message("System", "Chat cleared. Memory reset.", "system")
     
-    def save_memory(self):
-        memory_data = {
-            "conversation_history": self.conversation_history[-50:],  # Keep last 50 messages
-            "last_model": self.selected_model.get(),
-            "timestamp": datetime.now().isoformat()
-        }
-        with open(self.memory_file, 'w') as f:
-            json.dump(memory_data, f, indent=2)
+    def save_memory(self, message, conversation_id, model=None):
+        """Append one message to a stored conversation"""
+        try:
+            self.store.append(conversation_id, message, model=model)
+        except sqlite3.Error as e:
+            self.post_log(f"Error saving memory: {e}", "ERROR")
     
     def load_memory(self):
-        if os.path.exists(self.memory_file):
-            try:
-                with open(self.memory_file, 'r') as f:
-                    memory_data = json.load(f)
-                    self.conversation_history = memory_data.get("conversation_history", [])
-                    
-                    # Display loaded conversation
-                    for msg in self.conversation_history:
-                        if msg["role"] == "user":
-                            self.display_message("You", msg["content"], "user")
-                        else:
-                            self.display_message("Assistant", msg["content"], "assistant")
-                    
-                    if self.conversation_history:
-                        self.display_message("System", "Previous conversation loaded from memory.", "system")
-            except Exception as e:
-                print(f"Error loading memory: {e}")
+        try:
+            self.store.open()
+            self.conversation_id = self.store.latest_conversation()
+            
+            # Display only the most recent page; older messages load on scroll
+            self.renderer.page_size = self.config.get("chat_page_size", 50)
+            self.renderer.max_rendered = max(self.config.get("chat_max_rendered", 200), self.renderer.page_size)
+            self.load_conversation()
+            
+            if self.conversation_history:
+                self.display_message("System", "Previous conversation loaded from memory.", "system")
+        except Exception as e:
+            print(f"Error loading memory: {e}")
+    
+    def load_conversation(self):
+        """Read the current conversation from the store and show its latest page"""
+        self.view_id += 1
+        self.conversation_history = self.store.load(self.conversation_id)
+        self.renderer.show_latest()
+        self.refresh_conversation_list()
+    
+    def refresh_conversation_list(self):
+        try:
+            self.conversations = self.store.list_conversations()
+        except sqlite3.Error as e:
+            self.log_message(f"Error listing conversations: {e}", "ERROR")
+            return
+        
+        self.conversation_dropdown["values"] = [c["title"] for c in self.conversations]
+        for index, conversation in enumerate(self.conversations):
+            if conversation["id"] == self.conversation_id:
+                self.conversation_dropdown.current(index)
+                break
+    
+    def on_conversation_selected(self, event=None):
+        index = self.conversation_dropdown.current()
+        if 0 <= index < len(self.conversations):
+            self.switch_conversation(self.conversations[index]["id"])
+    
+    def switch_conversation(self, conversation_id):
+        """Open another conversation, stopping any reply still running in the current one"""
+        if conversation_id == self.conversation_id:
+            return
+        
+        self.stop_response()
+        self.conversation_id = conversation_id
+        try:
+            self.load_conversation()
+        except sqlite3.Error as e:
+            self.log_message(f"Error loading conversation: {e}", "ERROR")
+            return
+        self.log_message(f"Switched to conversation: {self.conversation_dropdown.get()}")
+    
+    def new_conversation(self):
+        try:
+            conversation_id = self.store.create_conversation()
+        except sqlite3.Error as e:
+            self.log_message(f"Error creating conversation: {e}", "ERROR")
+            return
+        self.switch_conversation(conversation_id)
+    
+    def rename_conversation(self):
+        title = simpledialog.askstring("Rename Conversation", "New name:",
+                                       initialvalue=self.conversation_dropdown.get(), parent=self.root)
+        if title is None:
+            return
+        
+        self.store.rename_conversation(self.conversation_id, title.strip())
+        self.refresh_conversation_list()
+    
+    def delete_conversation(self):
+        if not messagebox.askyesno("Delete Conversation",
+                                   f"Delete \"{self.conversation_dropdown.get()}\" and all of its messages?"):
+            return
+        
+        self.stop_response()
+        self.compactor.forget(self.conversation_id)
+        self.store.delete_conversation(self.conversation_id)
+        self.log_message(f"Deleted conversation: {self.conversation_dropdown.get()}")
+        # Fall back to the most recent remaining conversation (a fresh one if none are left)
+        self.conversation_id = None
+        self.switch_conversation(self.store.latest_conversation())
+    
+    def open_search(self):
+        SearchWindow(self, self.search_entry.get().strip())
 
 def main():
+    profile = StartupProfile(STARTUP_STARTED)
+    profile.marks.append(("imports", IMPORTS_DONE))
+    
     root = tk.Tk()
-    app = OpenRouterChatbot(root)
+    profile.mark("tk root")
+    app = OpenRouterChatbot(root, profile)
+    
+    def on_first_map(event):
+        if event.widget is not root or profile.elapsed("first window") is not None:
+            return
+        profile.mark("first window")
+        app.log_message(f"Time to first window: {profile.elapsed('first window') * 1000:.0f} ms")
+        app.event_log.log("startup profile", "INFO",
+                          marks={name: round((at - profile.started_at) * 1000, 1) for name, at in profile.marks})
+        if "--profile-startup" in sys.argv or os.environ.get("OPENROUTER_PROFILE_STARTUP"):
+            print(profile.report())
+    
+    root.bind("<Map>", on_first_map, add="+")
     root.mainloop()
+    app.ui.stop()
+    if app.watchdog:
+        app.watchdog.stop()
+    for path in app.handler_profiler.dump():
+        print(f"Handler profile written to {path}")
+    app.scheduler.shutdown()
+    app.compactor.shutdown()
+    app.store.close()
+    app.event_log.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,346 @@
+"""
+Pooled HTTP client shared by every code path that talks to the OpenRouter API
+"""
+
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
+
+# Rate limits and transient upstream failures are worth another attempt
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def api_base_url(config=None):
+    """Base URL from $OPENROUTER_API_BASE, then config.json's api_base, then the public API"""
+    return os.environ.get("OPENROUTER_API_BASE") or (config or {}).get("api_base") or OPENROUTER_API_BASE
+
+
+# Connection setup timings (and the cancel token) for the request currently running on this thread
+_connection_timing = threading.local()
+
+
+class RequestCancelled(Exception):
+    """The request was stopped through its CancelToken"""
+
+
+class CancelToken:
+    """Lets another thread abort an in-flight request.
+
+    The client attaches the connection a request is sent on, before a new
+    connection starts connecting; cancel() shuts down its socket, which breaks
+    a blocked TLS handshake, header wait or body read immediately instead of
+    waiting for the read timeout. A TCP connect has no socket to shut down
+    yet, so it is abandoned as soon as it returns (at most connect_timeout).
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.connection = None
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self):
+        self.event.set()
+        # Shut down under the lock so a detached connection back in the pool is never touched
+        with self.lock:
+            # During a TLS handshake the SSL layer owns the socket; a duplicate of it is kept for this
+            sock = getattr(self.connection, "handshake_sock", None) or getattr(self.connection, "sock", None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def attach(self, connection):
+        with self.lock:
+            self.connection = connection
+        if self.cancelled:
+            self.cancel()
+
+    def detach(self):
+        """Forget the connection once the response is done, before it goes back to the pool"""
+        with self.lock:
+            self.connection = None
+
+    def check(self):
+        if self.cancelled:
+            raise RequestCancelled("Request cancelled")
+
+
+def _attach_cancel_token(connection):
+    token = getattr(_connection_timing, "cancel_token", None)
+    if token is not None:
+        token.attach(connection)
+
+
+def _abort_if_cancelled(sock):
+    """Close a socket whose request was cancelled while it was still connecting"""
+    token = getattr(_connection_timing, "cancel_token", None)
+    if token is not None and token.cancelled:
+        sock.close()
+        raise ConnectionAbortedError("Request cancelled while connecting")
+    return sock
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        _attach_cancel_token(self)
+        super().connect()
+
+    def request(self, *args, **kwargs):
+        _attach_cancel_token(self)
+        return super().request(*args, **kwargs)
+
+    def _new_conn(self):
+        # urllib3 resolves the host inside create_connection, so this covers DNS + TCP
+        started = time.perf_counter()
+        try:
+            sock = super()._new_conn()
+        finally:
+            _connection_timing.connect = time.perf_counter() - started
+        return _abort_if_cancelled(sock)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    # Duplicate of the raw socket while a cancellable request runs the TLS handshake
+    handshake_sock = None
+
+    def request(self, *args, **kwargs):
+        _attach_cancel_token(self)
+        return super().request(*args, **kwargs)
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        try:
+            sock = super()._new_conn()
+        finally:
+            _connection_timing.connect = time.perf_counter() - started
+        sock = _abort_if_cancelled(sock)
+        if getattr(_connection_timing, "cancel_token", None) is not None:
+            # Wrapping for TLS takes the descriptor away from `sock`; shutting down a
+            # duplicate still breaks the handshake if the request is cancelled
+            self.handshake_sock = sock.dup()
+        return sock
+
+    def connect(self):
+        # Attached before connecting, so cancelling can break a slow TLS handshake too
+        _attach_cancel_token(self)
+        started = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            self._close_handshake_sock()
+        # Whatever connect() spent beyond opening the socket was the TLS handshake
+        _connection_timing.tls = time.perf_counter() - started - getattr(_connection_timing, "connect", 0.0)
+
+    def _close_handshake_sock(self):
+        sock = self.handshake_sock
+        if sock is None:
+            return
+        # Forgotten under the token's lock first, so cancel() never shuts down a closed descriptor
+        with _connection_timing.cancel_token.lock:
+            self.handshake_sock = None
+        sock.close()
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections record DNS/TCP connect and TLS handshake time"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool
+        }
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class OpenRouterClient:
+    """Keeps one requests.Session alive so turns reuse TCP+TLS connections.
+
+    Every request gets a (connect, read) timeout and is retried with jittered
+    exponential backoff on 429/5xx, honoring the server's Retry-After header.
+    Responses carry a `timing` dict with connect, tls and ttfb in seconds;
+    connect and tls are 0 when a pooled connection was reused. Passing a
+    CancelToken makes the request abortable from another thread; it then
+    raises RequestCancelled. `max_retries` can be lowered per request, e.g.
+    when a fallback model is ready to take over. With `pool_block`, at most
+    `pool_size` connections are ever open per host; further requests wait for
+    a free one instead of opening a throwaway connection.
+    """
+
+    def __init__(self, api_key="", base_url=OPENROUTER_API_BASE, connect_timeout=5.0,
+                 read_timeout=120.0, max_retries=3, backoff_base=0.5, backoff_max=30.0,
+                 pool_size=10, pool_block=False, on_retry=None, rate_limiter=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_retry = on_retry
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        # Retries are handled in request() so they can honor Retry-After and stay visible in the log
+        adapter = TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=pool_block,
+                                   max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def request(self, method, path, stream=False, headers=None, cancel_token=None, max_retries=None, **kwargs):
+        """Send a request, retrying transient failures, and return the final response"""
+        url = f"{self.base_url}{path}"
+        if max_retries is None:
+            max_retries = self.max_retries
+        request_headers = self.headers()
+        if headers:
+            request_headers.update(headers)
+
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            if cancel_token:
+                cancel_token.check()
+            _connection_timing.connect = 0.0
+            _connection_timing.tls = 0.0
+            _connection_timing.cancel_token = cancel_token
+            try:
+                response = self.session.request(method, url, headers=request_headers, stream=stream,
+                                                timeout=(self.connect_timeout, self.read_timeout),
+                                                **kwargs)
+            except requests.exceptions.RequestException as e:
+                if cancel_token and cancel_token.cancelled:
+                    raise RequestCancelled("Request cancelled") from e
+                # A read timeout on POST may mean the model is still generating (and billing),
+                # so only failures to connect are retried for non-idempotent requests
+                retryable = isinstance(e, requests.exceptions.ConnectionError) or method == "GET"
+                if not retryable or attempt >= max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                self._notify_retry(attempt, delay, str(e))
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                    if cancel_token and not stream:
+                        # The body is already read and the connection is back in the pool
+                        cancel_token.detach()
+                    response.timing = {
+                        "connect": _connection_timing.connect,
+                        "tls": _connection_timing.tls,
+                        "ttfb": response.elapsed.total_seconds(),
+                        "reused": _connection_timing.connect == 0.0
+                    }
+                    return response
+                delay = self.retry_after(response)
+                if delay is None:
+                    delay = self.backoff_delay(attempt)
+                self._notify_retry(attempt, delay, f"HTTP {response.status_code}")
+                response.close()
+            finally:
+                _connection_timing.cancel_token = None
+
+            if cancel_token:
+                # Sleep through the backoff unless the request is cancelled meanwhile
+                cancel_token.detach()
+                if cancel_token.event.wait(delay):
+                    raise RequestCancelled("Request cancelled")
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def list_models(self, headers=None):
+        return self.get("/models", headers=headers)
+
+    def chat_completion(self, payload, stream=False, cancel_token=None, max_retries=None):
+        return self.post("/chat/completions", json=payload, stream=stream, cancel_token=cancel_token,
+                         max_retries=max_retries)
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def retry_after(self, response):
+        """Seconds to wait according to the Retry-After header, or None if absent"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+
+        try:
+            delay = float(value)
+        except ValueError:
+            # Retry-After may also be an HTTP date
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if retry_at.tzinfo is None:
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+
+        return min(max(delay, 0.0), self.backoff_max)
+
+    def _notify_retry(self, attempt, delay, reason):
+        if self.on_retry:
+            self.on_retry(attempt + 1, delay, reason)
+
+    def close(self):
+        self.session.close()
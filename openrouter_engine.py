@@ -0,0 +1,545 @@
+"""
+GUI-free chat engine: request building, completion (streaming or not), caching
+and <thinking> parsing shared by the Tk app and the headless tools
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from context_builder import ContextBuilder, estimate_tokens
+from history_compactor import summary_message
+from metrics import describe_metrics, request_metrics
+from model_fallback import is_model_failure
+from openrouter_client import RequestCancelled
+
+# Model families whose providers only cache the prompt at explicit cache_control breakpoints
+CACHE_CONTROL_PREFIXES = ("anthropic/", "google/gemini")
+
+
+class ChatAPIError(Exception):
+    """An error payload returned by OpenRouter, either as a non-200 response or mid-stream"""
+
+    def __init__(self, status_code, error_data):
+        self.status_code = status_code
+        self.error_data = error_data
+        self.error_info = error_data.get('error') or {}
+        self.message = self.error_info.get('message', 'Unknown error')
+        super().__init__(f"API Error {status_code}: {self.message}")
+
+
+class ThinkingParser:
+    """Single-pass splitter for <thinking> blocks in text that arrives in chunks.
+
+    feed() takes chunks split anywhere, including inside a tag, and returns the
+    new ("thinking" | "answer", text) pieces in order. Multiple blocks are
+    joined with a blank line and an unclosed block counts as thinking up to the
+    end. Leading and trailing whitespace of both parts is dropped, matching
+    what a strip() of the finished text would give.
+    """
+
+    OPEN_TAG = "<thinking>"
+    CLOSE_TAG = "</thinking>"
+
+    def __init__(self):
+        self.in_thinking = False
+        self.partial = ""
+        self.parts = {"thinking": [], "answer": []}
+        # Trailing whitespace is held back until more text of the same kind follows
+        self.held = {"thinking": "", "answer": ""}
+        self.fresh = {"thinking": True, "answer": True}
+
+    @property
+    def thinking(self):
+        return ''.join(self.parts["thinking"]) or None
+
+    @property
+    def answer(self):
+        return ''.join(self.parts["answer"])
+
+    def feed(self, text):
+        """Parse the next chunk of content"""
+        pieces = []
+        buffer = self.partial + text
+        self.partial = ""
+        pos = 0
+
+        while pos < len(buffer):
+            tag = self.CLOSE_TAG if self.in_thinking else self.OPEN_TAG
+            kind = "thinking" if self.in_thinking else "answer"
+            found = buffer.find(tag, pos)
+            if found < 0:
+                # Keep a possible tag prefix at the end for the next chunk
+                keep = self._partial_tag(buffer, pos, tag)
+                self._emit(kind, buffer[pos:len(buffer) - keep], pieces)
+                self.partial = buffer[len(buffer) - keep:]
+                break
+
+            self._emit(kind, buffer[pos:found], pieces)
+            pos = found + len(tag)
+            self.in_thinking = not self.in_thinking
+            if self.in_thinking:
+                self.fresh["thinking"] = True
+        return pieces
+
+    def feed_reasoning(self, text):
+        """Add text from a separate reasoning field, which is all thinking"""
+        pieces = []
+        self._emit("thinking", text, pieces)
+        return pieces
+
+    def close(self):
+        """Flush a trailing partial tag once the text is complete"""
+        pieces = []
+        self._emit("thinking" if self.in_thinking else "answer", self.partial, pieces)
+        self.partial = ""
+        return pieces
+
+    def _emit(self, kind, text, pieces):
+        if self.fresh[kind]:
+            text = text.lstrip()
+            if not text:
+                return
+            self.fresh[kind] = False
+            if self.parts[kind]:
+                self.held[kind] = "\n\n"
+
+        body = text.rstrip()
+        if not body:
+            self.held[kind] += text
+            return
+
+        piece = self.held[kind] + body
+        self.held[kind] = text[len(body):]
+        self.parts[kind].append(piece)
+        pieces.append((kind, piece))
+
+    @staticmethod
+    def _partial_tag(buffer, pos, tag):
+        """Length of the longest tail of buffer[pos:] that could be the start of tag"""
+        for size in range(min(len(tag) - 1, len(buffer) - pos), 0, -1):
+            if buffer.endswith(tag[:size]):
+                return size
+        return 0
+
+
+def extract_thinking(full_response, reasoning=None):
+    """Split a response into its thinking text (or None) and the text to display"""
+    parser = ThinkingParser()
+    if reasoning:
+        parser.feed_reasoning(reasoning)
+    parser.feed(full_response)
+    parser.close()
+    return parser.thinking, parser.answer
+
+
+def iter_sse_events(response):
+    """Yield decoded JSON payloads from a server-sent events response"""
+    # text/event-stream carries no charset, so requests would otherwise assume latin-1
+    response.encoding = 'utf-8'
+
+    for line in response.iter_lines(decode_unicode=True):
+        # Blank lines separate events, lines starting with ':' are keep-alive comments
+        if not line or line.startswith(':') or not line.startswith('data:'):
+            continue
+
+        payload = line[len('data:'):].strip()
+        if payload == '[DONE]':
+            break
+
+        try:
+            yield json.loads(payload)
+        except ValueError:
+            continue
+
+
+def error_payload(response):
+    """Parse an error body, tolerating non-JSON responses from proxies and gateways"""
+    try:
+        return response.json()
+    except ValueError:
+        return {"error": {"message": response.text or f"HTTP {response.status_code}"}}
+
+
+def estimate_cost(model_info, usage):
+    """Request cost in USD from the usage block, falling back to catalog pricing"""
+    if not usage:
+        return None
+    if usage.get("cost") is not None:
+        return usage["cost"]
+
+    pricing = (model_info or {}).get("pricing") or {}
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    try:
+        return ((usage.get("prompt_tokens", 0) - cached_tokens) * float(pricing.get("prompt", 0)) +
+                cached_tokens * float(pricing.get("input_cache_read", pricing.get("prompt", 0))) +
+                usage.get("completion_tokens", 0) * float(pricing.get("completion", 0)))
+    except (TypeError, ValueError):
+        return None
+
+
+def supports_cache_control(model):
+    """Whether the model's providers take explicit cache_control breakpoints; others cache prefixes on their own"""
+    return model.startswith(CACHE_CONTROL_PREFIXES)
+
+
+def with_cache_breakpoints(messages, prefix_length=0):
+    """Copy of the messages with cache_control on the end of the stable prefix and of the last two user turns.
+
+    The breakpoint on the latest message writes the whole prompt to the cache;
+    the one on the previous user message reads what the last turn wrote. Only
+    the marked messages are converted to the content-parts format.
+    """
+    marked = set()
+    if prefix_length:
+        marked.add(prefix_length - 1)
+    user_turns = [i for i, message in enumerate(messages) if message["role"] == "user"]
+    marked.update(user_turns[-2:])
+    if messages:
+        marked.add(len(messages) - 1)
+    # Providers accept at most four breakpoints per request
+    marked = sorted(marked)[-4:]
+
+    cached = list(messages)
+    for i in marked:
+        message = messages[i]
+        if not isinstance(message["content"], str):
+            continue
+        cached[i] = dict(message, content=[
+            {"type": "text", "text": message["content"], "cache_control": {"type": "ephemeral"}}
+        ])
+    return cached
+
+
+def _ignore_log(message, level="INFO"):
+    pass
+
+
+class ChatEngine:
+    """Runs chat completions against OpenRouter without any UI dependencies.
+
+    Progress is reported through optional callbacks: on_log(message, level) for
+    status lines, and on_delta(text) and on_thinking(text) for the answer and
+    thinking parts of streamed content as they arrive. Completions return a
+    result dict; API errors raise ChatAPIError, network failures propagate
+    as requests exceptions and a cancelled completion raises RequestCancelled.
+    """
+
+    def __init__(self, client, catalog=None, context_builder=None, response_cache=None, metrics=None):
+        self.client = client
+        self.catalog = catalog
+        self.context_builder = context_builder or ContextBuilder()
+        self.response_cache = response_cache
+        self.metrics = metrics
+
+    def build_payload(self, history, model, params=None, on_log=None, summary=None, system_prompt=None,
+                      prompt_cache=True, context_builder=None):
+        """Request body for a model with as much of the history as its window allows.
+
+        `summary` is an optional (text, covered) pair from the HistoryCompactor;
+        it is sent as a system message in place of the first `covered` messages.
+        The system prompt and summary form a prefix that only changes when the
+        summary does. With `prompt_cache`, models that need explicit breakpoints
+        get cache_control markers after that prefix and on the latest turns.
+        `context_builder` replaces the engine's own builder for this payload.
+        """
+        log = on_log or _ignore_log
+        builder = context_builder or self.context_builder
+        model_info = self.catalog.get(model) if self.catalog else None
+        summary_text, covered = summary or (None, 0)
+
+        prefix = []
+        if system_prompt:
+            prefix.append({"role": "system", "content": system_prompt})
+        if summary_text:
+            prefix.append(summary_message(summary_text))
+        reserved = sum(estimate_tokens(message["content"]) for message in prefix)
+        messages, prompt_tokens = builder.build(history, model_info, first=covered, reserved=reserved)
+        prompt_tokens += reserved
+        if summary_text:
+            log(f"Context: summary of {covered} messages + {len(messages)} messages, ~{prompt_tokens} tokens "
+                f"(budget {builder.budget(model_info)})")
+        else:
+            log(f"Context: {len(messages)} messages, ~{prompt_tokens} tokens "
+                f"(budget {builder.budget(model_info)})")
+
+        messages = prefix + messages
+        if prompt_cache and supports_cache_control(model):
+            messages = with_cache_breakpoints(messages, len(prefix))
+
+        # Ask for token usage, which streamed responses only include on request
+        payload = {"model": model, "messages": messages, "usage": {"include": True}}
+        if params:
+            payload.update(params)
+        return payload
+
+    def complete(self, payload, stream=False, use_cache=False, bypass_cache=False,
+                 on_log=None, on_delta=None, on_thinking=None, cancel_token=None, max_retries=None):
+        """Run one completion and return a result dict.
+
+        The result has the raw `content`, the `answer` with thinking removed,
+        the `thinking` text from <thinking> tags or the reasoning field (or None),
+        `model`, `usage`, `cost`, `ttft` and `latency` in seconds and whether it
+        was served from the response `cached`.
+        Every completion, failed or not, is recorded in the metrics store;
+        cancelled ones are not, since they say nothing about the model.
+        `max_retries` overrides the client's retry count for this request.
+        """
+        log = on_log or _ignore_log
+        started_at = time.time()
+        try:
+            result, timing = self._complete(payload, stream, use_cache, bypass_cache,
+                                            log, on_delta, on_thinking, cancel_token, started_at, max_retries)
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            if self.metrics is not None:
+                error = e.message if isinstance(e, ChatAPIError) else str(e)
+                self.metrics.record_error(payload["model"], time.time() - started_at, error)
+            raise
+
+        metrics = request_metrics(result, timing)
+        if not result["cached"]:
+            log(describe_metrics(metrics))
+        if self.metrics is not None:
+            self.metrics.record(metrics)
+        return result
+
+    def _complete(self, payload, stream, use_cache, bypass_cache, log, on_delta, on_thinking, cancel_token,
+                  started_at, max_retries=None):
+        """complete() without the metrics bookkeeping; returns (result, connection timing)"""
+
+        cache_key = None
+        if use_cache and self.response_cache is not None:
+            cache_key = self.response_cache.key_for(payload)
+            if bypass_cache:
+                log("Bypassing response cache for this request")
+            else:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    log("Response served from cache (cached)", "SUCCESS")
+                    thinking, answer = extract_thinking(cached)
+                    return self._result(payload["model"], cached, thinking, answer, None, started_at, None,
+                                        cached=True), None
+
+        if stream:
+            content, reasoning, usage, first_token_at, timing, parser = self._stream(
+                payload, log, on_delta, on_thinking, cancel_token, max_retries)
+            thinking, answer = parser.thinking, parser.answer
+        else:
+            content, reasoning, usage, timing = self._request(payload, log, cancel_token, max_retries)
+            thinking, answer = extract_thinking(content, reasoning)
+            first_token_at = None
+
+        log("Response received successfully", "SUCCESS")
+        result = self._result(payload["model"], content, thinking, answer, usage, started_at, first_token_at)
+        if result["thinking"]:
+            log("Model thinking process detected")
+
+        if cache_key:
+            # Fold a separate reasoning field into the cached text so hits show it too
+            if reasoning:
+                content = f"<thinking>{reasoning}</thinking>{content}"
+            try:
+                self.response_cache.put(cache_key, content)
+            except OSError as e:
+                log(f"Error saving response cache: {e}", "ERROR")
+
+        return result, timing
+
+    def _request(self, payload, log, cancel_token=None, max_retries=None):
+        log("Sending request to OpenRouter API...")
+        response = self.client.chat_completion(payload, cancel_token=cancel_token, max_retries=max_retries)
+
+        if response.status_code != 200:
+            raise ChatAPIError(response.status_code, error_payload(response))
+
+        log("Response received, processing...", "SUCCESS")
+        result = response.json()
+        message = result['choices'][0]['message']
+        return (message.get('content') or '', message.get('reasoning'), result.get('usage'),
+                getattr(response, 'timing', None))
+
+    def _stream(self, payload, log, on_delta, on_thinking, cancel_token=None, max_retries=None):
+        """Stream a completion over SSE, passing answer and thinking text to the callbacks as it arrives"""
+        payload = dict(payload, stream=True)
+
+        log("Sending streaming request to OpenRouter API...")
+        response = self.client.chat_completion(payload, stream=True, cancel_token=cancel_token,
+                                               max_retries=max_retries)
+
+        chunks = []
+        reasoning_chunks = []
+        parser = ThinkingParser()
+        usage = None
+        first_token_at = None
+
+        def dispatch(pieces):
+            for kind, text in pieces:
+                callback = on_thinking if kind == "thinking" else on_delta
+                if callback:
+                    callback(text)
+
+        try:
+            if response.status_code != 200:
+                raise ChatAPIError(response.status_code, error_payload(response))
+
+            for event in iter_sse_events(response):
+                if cancel_token:
+                    cancel_token.check()
+
+                # OpenRouter reports errors after the 200 header as an error payload in the stream
+                if 'error' in event:
+                    raise ChatAPIError(event['error'].get('code', response.status_code), event)
+
+                if event.get('usage'):
+                    usage = event['usage']
+
+                choices = event.get('choices') or []
+                if not choices:
+                    continue
+
+                delta = choices[0].get('delta') or {}
+                # Reasoning models send their thinking in a separate field ahead of the content
+                reasoning = delta.get('reasoning')
+                content = delta.get('content')
+                if not reasoning and not content:
+                    continue
+
+                if first_token_at is None:
+                    first_token_at = time.time()
+                    log("First token received, streaming...", "SUCCESS")
+                if reasoning:
+                    reasoning_chunks.append(reasoning)
+                    dispatch(parser.feed_reasoning(reasoning))
+                if content:
+                    chunks.append(content)
+                    dispatch(parser.feed(content))
+            dispatch(parser.close())
+        except RequestCancelled:
+            raise
+        except Exception:
+            # Cancelling shuts the socket, which surfaces here as whatever read error it caused
+            if cancel_token and cancel_token.cancelled:
+                raise RequestCancelled("Request cancelled")
+            raise
+        finally:
+            if cancel_token:
+                cancel_token.detach()
+            response.close()
+
+        return (''.join(chunks), ''.join(reasoning_chunks) or None, usage, first_token_at,
+                getattr(response, 'timing', None), parser)
+
+    def complete_with_fallback(self, build_payload, model, router, on_log=None, on_delta=None,
+                               on_thinking=None, fallback_retries=1, **kwargs):
+        """complete() that moves down the router's fallback list when a model fails.
+
+        `build_payload(model)` returns the request body for each model tried, so
+        every attempt fits that model's context window. Models whose circuit is
+        open are skipped, unless all of them are, and provider failures count
+        against the breaker. Every attempt but the last uses `fallback_retries`
+        client retries so the switch happens quickly. Once any text has been
+        streamed an error is raised as is, since another model would start the
+        reply over. The result gains the `requested_model`.
+        """
+        log = on_log or _ignore_log
+        breaker = router.breaker
+        candidates = router.candidates(model)
+        attempts = [candidate for candidate in candidates if breaker.allow(candidate)]
+        skipped = [candidate for candidate in candidates if candidate not in attempts]
+        if skipped:
+            log(f"Skipping {', '.join(skipped)}: taken out of rotation after repeated failures", "WARNING")
+        if not attempts:
+            log(f"Every model is out of rotation; trying {model} anyway", "WARNING")
+            attempts = [model]
+
+        streamed = {"started": False}
+
+        def relay(callback):
+            if callback is None:
+                return None
+
+            def relayed(text):
+                streamed["started"] = True
+                callback(text)
+            return relayed
+
+        tried = 0
+        try:
+            for index, candidate in enumerate(attempts):
+                tried = index + 1
+                last = index == len(attempts) - 1
+                if index:
+                    log(f"Falling back to {candidate}...", "WARNING")
+                try:
+                    result = self.complete(build_payload(candidate), on_log=on_log, on_delta=relay(on_delta),
+                                           on_thinking=relay(on_thinking),
+                                           max_retries=None if last else fallback_retries, **kwargs)
+                except Exception as e:
+                    if not is_model_failure(e):
+                        breaker.release(candidate)
+                        raise
+                    opened = breaker.record_failure(candidate)
+                    if not last and not streamed["started"]:
+                        log(f"{candidate} failed: {getattr(e, 'message', e)}", "WARNING")
+                    if opened:
+                        log(f"{candidate} taken out of rotation for {breaker.cooldown:.0f}s", "WARNING")
+                    if last or streamed["started"]:
+                        raise
+                    continue
+
+                breaker.record_success(candidate)
+                result["requested_model"] = model
+                if candidate != model:
+                    log(f"Answered by {candidate} (fallback for {model})", "SUCCESS")
+                return result
+        finally:
+            # Hand back the half-open trial slots of models that were never tried
+            for candidate in attempts[tried:]:
+                breaker.release(candidate)
+
+    def fan_out(self, history, models, stream=True, on_delta=None, on_result=None, on_error=None,
+                on_thinking=None):
+        """Send the same conversation to several models at once without blocking the caller.
+
+        Each model runs on its own worker over the shared connection pool.
+        on_delta(model, text), on_thinking(model, text), on_result(model, result)
+        and on_error(model, exc) fire from the worker threads as each model progresses.
+        The run gets its own context builder, so it leaves the window and token
+        counts of the main conversation alone.
+        """
+        builder = self.context_builder.copy()
+
+        def run(model):
+            try:
+                payload = self.build_payload(history, model, context_builder=builder)
+                model_delta = (lambda text: on_delta(model, text)) if on_delta else None
+                model_thinking = (lambda text: on_thinking(model, text)) if on_thinking else None
+                result = self.complete(payload, stream=stream, on_delta=model_delta, on_thinking=model_thinking)
+            except Exception as e:
+                if on_error:
+                    on_error(model, e)
+                return
+            if on_result:
+                on_result(model, result)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, len(models)))
+        futures = [executor.submit(run, model) for model in models]
+        executor.shutdown(wait=False)
+        return futures
+
+    def _result(self, model, content, thinking, answer, usage, started_at, first_token_at, cached=False):
+        finished_at = time.time()
+        model_info = self.catalog.get(model) if self.catalog else None
+        return {
+            "model": model,
+            "content": content,
+            "answer": answer,
+            "thinking": thinking,
+            "usage": usage,
+            "cost": estimate_cost(model_info, usage),
+            "ttft": (first_token_at or finished_at) - started_at,
+            "latency": finished_at - started_at,
+            "cached": cached
+        }
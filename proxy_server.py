@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Headless OpenAI-compatible proxy that lets many local clients share one
+upstream connection pool, model catalog and response cache.
+
+Usage:
+    ./proxy_server.py --host 0.0.0.0 --port 8788 --rate 10 --token team-secret --cache
+
+Clients use http://<host>:8788/v1 (or /api/v1) as their base URL and send the
+proxy token as their API key; only the proxy holds the OpenRouter key. The GUI
+points at it with OPENROUTER_API_BASE=http://<host>:8788/api/v1 (or "api_base"
+in config.json) and the token entered as its API key.
+
+Every client connection runs on its own thread, like the rest of the app, while
+upstream requests go through one OpenRouterClient: at most --pool pooled
+connections, --rate requests per second, and the usual retries with backoff.
+Streaming responses are passed through line by line as they arrive.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import requests
+
+from local_server import CLIENT_GONE_ERRORS, APIHandler, APIServer, api_error, load_config
+from model_catalog import ModelCatalog, ModelCatalogError
+from openrouter_client import OPENROUTER_API_BASE, OpenRouterClient, RateLimiter
+from response_cache import ResponseCache
+
+# Both the OpenAI layout and OpenRouter's own, so either kind of base URL works
+API_PREFIXES = ("/api/v1", "/v1")
+
+
+def cached_completion(model, content):
+    """OpenAI-style completion body for a response served from the cache"""
+    return {
+        "id": f"gen-cache-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]
+    }
+
+
+class ProxyHandler(APIHandler):
+    def route(self):
+        """Path below the API prefix, e.g. "/models", or None for unknown paths"""
+        path = self.path.split("?")[0]
+        for prefix in API_PREFIXES:
+            if path.startswith(prefix + "/"):
+                return path[len(prefix):]
+        return None
+
+    def authorized(self):
+        if not self.server.token or self.headers.get("Authorization") == f"Bearer {self.server.token}":
+            return True
+        self.send_json(401, api_error(401, "Invalid proxy token"))
+        return False
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        if self.route() != "/models":
+            return self.send_json(404, api_error(404, "Not found"))
+
+        try:
+            body, etag = self.server.models_body()
+        except (ModelCatalogError, requests.exceptions.RequestException) as e:
+            return self.send_json(502, api_error(502, f"Model list unavailable: {e}"))
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_json(200, body, {"ETag": etag})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if not self.authorized():
+            return
+        if self.route() != "/chat/completions":
+            return self.send_json(404, api_error(404, "Not found"))
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return self.send_json(400, api_error(400, "Invalid JSON"))
+        if not payload.get("model") or not payload.get("messages"):
+            return self.send_json(400, api_error(400, "model and messages are required"))
+
+        started = time.perf_counter()
+        stream = bool(payload.get("stream"))
+        status = self.complete(payload, stream)
+        self.server.log(f"{self.client_address[0]} {payload['model']} {'stream' if stream else 'request'} "
+                        f"-> {status} in {time.perf_counter() - started:.2f}s")
+
+    def complete(self, payload, stream):
+        """Answer one chat completion from the cache or upstream; returns the status for the log"""
+        cache = self.server.response_cache
+        cache_key = None
+        if cache is not None and "no-cache" not in (self.headers.get("Cache-Control") or ""):
+            cache_key = cache.key_for(payload)
+            content = cache.get(cache_key)
+            if content is not None:
+                if stream:
+                    self.stream_cached(payload["model"], content)
+                else:
+                    self.send_json(200, cached_completion(payload["model"], content), {"X-Cache": "HIT"})
+                return "200 (cached)"
+
+        try:
+            response = self.server.client.chat_completion(payload, stream=stream)
+        except requests.exceptions.RequestException as e:
+            self.send_json(502, api_error(502, f"Upstream request failed: {e}"))
+            return "502"
+
+        try:
+            if response.status_code != 200 or not stream:
+                body = response.content
+                if response.status_code == 200 and cache_key:
+                    self.cache_response(cache_key, response)
+                self.send_json(response.status_code, body)
+            else:
+                self.stream_through(response, cache_key)
+        finally:
+            response.close()
+        return str(response.status_code)
+
+    def cache_response(self, cache_key, response):
+        try:
+            message = response.json()["choices"][0]["message"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            return
+        self.put_cached(cache_key, message.get("content") or "", message.get("reasoning"))
+
+    def put_cached(self, cache_key, content, reasoning=None):
+        # Same layout as the GUI's cache: a separate reasoning field is folded into the text
+        if reasoning:
+            content = f"<thinking>{reasoning}</thinking>{content}"
+        try:
+            self.server.response_cache.put(cache_key, content)
+        except OSError as e:
+            self.server.log(f"Error saving response cache: {e}")
+
+    def stream_through(self, response, cache_key):
+        """Relay upstream SSE lines to the client as they arrive, collecting the reply for the cache"""
+        self.start_event_stream()
+
+        chunks = []
+        reasoning_chunks = []
+        finished = False
+        try:
+            for line in response.iter_lines():
+                self.write_chunk(line + b"\n")
+                if cache_key and line.startswith(b"data:"):
+                    data = line[len(b"data:"):].strip()
+                    if data == b"[DONE]":
+                        finished = True
+                        continue
+                    try:
+                        event = json.loads(data)
+                        delta = (event.get("choices") or [{}])[0].get("delta") or {}
+                    except (ValueError, AttributeError, IndexError):
+                        continue
+                    chunks.append(delta.get("content") or "")
+                    reasoning_chunks.append(delta.get("reasoning") or "")
+            self.write_chunk(b"")
+        except CLIENT_GONE_ERRORS:
+            # The client went away; closing the upstream response stops the generation
+            self.close_connection = True
+            return
+        except requests.exceptions.RequestException as e:
+            # Upstream broke off mid-reply; end the client's stream with an error rather than leave it hanging
+            self.server.log(f"Upstream stream failed: {e}")
+            self.end_event_stream_with_error(502, f"Upstream stream failed: {e}")
+            return
+
+        # Only complete replies are cached, never a stream cut off upstream
+        if cache_key and finished:
+            self.put_cached(cache_key, "".join(chunks), "".join(reasoning_chunks) or None)
+
+    def stream_cached(self, model, content):
+        self.start_event_stream({"X-Cache": "HIT"})
+        for delta, finish_reason in (({"role": "assistant", "content": content}, None), ({}, "stop")):
+            self.write_event({"id": "gen-cache", "object": "chat.completion.chunk", "model": model,
+                              "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]})
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+
+class ProxyServer(APIServer):
+    """Serves the proxy API with one shared client, catalog and (optional) response cache"""
+
+    # Room for bursts of connections from many clients
+    request_queue_size = 64
+
+    def __init__(self, address, client, catalog, response_cache=None, token=None, verbose=False, quiet=False):
+        super().__init__(address, ProxyHandler)
+        self.client = client
+        self.catalog = catalog
+        self.response_cache = response_cache
+        self.token = token
+        self.verbose = verbose
+        self.quiet = quiet
+        self.catalog_lock = threading.Lock()
+        self.models_response = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def log(self, message):
+        if not self.quiet:
+            print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    def models_body(self):
+        """(JSON body, ETag) of the shared catalog, revalidating it upstream once it is stale"""
+        with self.catalog_lock:
+            if self.catalog.is_stale():
+                try:
+                    if self.catalog.refresh(self.client):
+                        self.models_response = None
+                    self.log(f"Model catalog refreshed ({len(self.catalog.models)} models)")
+                except (ModelCatalogError, requests.exceptions.RequestException) as e:
+                    # A stale catalog beats none; clients see the error only if there is nothing to serve
+                    if not self.catalog.models:
+                        raise
+                    self.log(f"Model catalog refresh failed, serving cached list: {e}")
+
+            if self.models_response is None:
+                body = json.dumps({"data": self.catalog.models}).encode("utf-8")
+                self.models_response = (body, '"' + hashlib.sha256(body).hexdigest()[:16] + '"')
+            return self.models_response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible proxy to OpenRouter")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (0.0.0.0 for the whole network)")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--upstream", help="OpenRouter API base (default: $OPENROUTER_API_BASE or openrouter.ai)")
+    parser.add_argument("-r", "--rate", type=float, default=10.0, help="maximum upstream requests per second")
+    parser.add_argument("--pool", type=int, default=20, help="maximum pooled upstream connections")
+    parser.add_argument("--token", help="token clients must send as their API key (default: $OPENROUTER_PROXY_TOKEN)")
+    parser.add_argument("--cache", action="store_true", help="serve repeated requests from the shared response cache")
+    parser.add_argument("--config", default="config.json", help="GUI config file for the API key and defaults")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not log every request")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also print the HTTP access log")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    api_key = os.environ.get("OPENROUTER_API_KEY") or config.get("api_key", "")
+    if not api_key:
+        parser.error("no API key: set OPENROUTER_API_KEY or save one in the GUI")
+    token = args.token or os.environ.get("OPENROUTER_PROXY_TOKEN") or config.get("proxy_token")
+    if args.host not in ("127.0.0.1", "localhost", "::1") and not token:
+        print("Warning: listening beyond localhost without --token; anyone who can reach it uses your key")
+
+    # config.json's api_base is skipped on purpose: on a GUI machine it may point at this proxy
+    upstream = args.upstream or os.environ.get("OPENROUTER_API_BASE") or OPENROUTER_API_BASE
+    client = OpenRouterClient(
+        api_key=api_key,
+        base_url=upstream,
+        connect_timeout=config.get("connect_timeout", 5.0),
+        read_timeout=config.get("read_timeout", 120.0),
+        max_retries=config.get("max_retries", 3),
+        # Block for a free connection instead of opening extra ones, so --pool is a hard limit
+        pool_size=args.pool,
+        pool_block=True,
+        rate_limiter=RateLimiter(args.rate) if args.rate else None,
+        on_retry=lambda attempt, delay, reason: print(f"  upstream retry {attempt} in {delay:.1f}s ({reason})")
+    )
+    catalog = ModelCatalog(ttl=config.get("model_cache_ttl", 3600))
+    catalog.load()
+    response_cache = None
+    if args.cache:
+        response_cache = ResponseCache(max_entries=config.get("response_cache_max_entries", 200),
+                                       ttl=config.get("response_cache_ttl", 86400))
+        response_cache.load()
+
+    server = ProxyServer((args.host, args.port), client, catalog, response_cache, token=token,
+                         verbose=args.verbose, quiet=args.quiet)
+    print(f"Proxy listening on http://{args.host}:{args.port}/v1 -> {upstream}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Bounded worker pool that runs chat requests in order, one at a time per conversation
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from openrouter_client import CancelToken
+
+
+class RequestScheduler:
+    """Queues jobs per conversation and runs them on a fixed number of workers.
+
+    Jobs for the same key run strictly one after another in submission order,
+    so replies can never interleave; different keys share the pool. Every job
+    is called as job(cancel_token), and cancel(key) aborts the running job's
+    HTTP transfer and drops the ones still waiting.
+    """
+
+    def __init__(self, max_workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="request")
+        self.lock = threading.Lock()
+        self.queues = {}
+        self.running = {}
+
+    def submit(self, key, job):
+        """Queue a job for a conversation and return its CancelToken"""
+        token = CancelToken()
+        with self.lock:
+            self.queues.setdefault(key, deque()).append((job, token))
+            if key not in self.running:
+                self._start_next(key)
+        return token
+
+    def pending(self, key):
+        """Number of jobs for a conversation that are queued or running"""
+        with self.lock:
+            return len(self.queues.get(key, ())) + (1 if key in self.running else 0)
+
+    def cancel(self, key):
+        """Stop the running job for a conversation and drop its queue; returns how many were cancelled"""
+        with self.lock:
+            dropped = self.queues.pop(key, ())
+            running = self.running.get(key)
+
+        tokens = [token for job, token in dropped]
+        if running is not None:
+            tokens.append(running)
+        for token in tokens:
+            token.cancel()
+        return len(tokens)
+
+    def shutdown(self):
+        """Cancel everything and let the workers exit"""
+        with self.lock:
+            keys = set(self.queues) | set(self.running)
+        for key in keys:
+            self.cancel(key)
+        self.executor.shutdown(wait=False)
+
+    def _start_next(self, key):
+        # Called with the lock held
+        queue = self.queues.get(key)
+        if not queue:
+            self.queues.pop(key, None)
+            self.running.pop(key, None)
+            return
+
+        job, token = queue.popleft()
+        self.running[key] = token
+        self.executor.submit(self._run, key, job, token)
+
+    def _run(self, key, job, token):
+        try:
+            if not token.cancelled:
+                job(token)
+        except Exception as e:
+            print(f"Error in scheduled request: {e}")
+        finally:
+            with self.lock:
+                self._start_next(key)
@@ -0,0 +1,96 @@
+"""
+Size-bounded LRU cache of chat completions with TTL and on-disk backing
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Maps a hash of (model, message window, sampling params) to a completion.
+
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once more than `max_entries` are stored. The cache is written to
+    a JSON file via temp file + rename, so it survives restarts.
+    """
+
+    def __init__(self, cache_file="response_cache.json", max_entries=200, ttl=86400):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+
+    def key_for(self, payload):
+        """Stable hash of a request payload, ignoring transport-only fields"""
+        messages = [
+            {"role": message["role"], "content": self._normalize(message["content"])}
+            for message in payload.get("messages", [])
+        ]
+        params = {k: v for k, v in payload.items() if k not in ("model", "messages", "stream")}
+        key_data = {"model": payload.get("model"), "messages": messages, "params": params}
+        encoded = json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["created_at"] > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry["response"]
+
+    def put(self, key, response):
+        with self.lock:
+            self.entries[key] = {"response": response, "created_at": time.time()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self.save()
+
+    def load(self):
+        if not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, 'r') as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading response cache: {e}")
+            return
+
+        now = time.time()
+        with self.lock:
+            # The file is written oldest-first, so insertion order restores LRU order
+            for key, entry in stored:
+                if now - entry["created_at"] <= self.ttl:
+                    self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def save(self):
+        # Serialize writers without blocking lookups while the file is written
+        with self.save_lock:
+            with self.lock:
+                stored = list(self.entries.items())
+
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_file, self.cache_file)
+
+    def _normalize(self, content):
+        if isinstance(content, list):
+            # Content parts differ only by cache_control markers, which do not change the answer
+            content = "".join(part.get("text", "") for part in content if part.get("type") == "text")
+        if not isinstance(content, str):
+            return content
+        return content.replace("\r\n", "\n").strip()
@@ -0,0 +1,83 @@
+"""
+Full-text search across every stored conversation
+"""
+
+import sqlite3
+import time
+import tkinter as tk
+from tkinter import ttk
+
+
+class SearchWindow(tk.Toplevel):
+    """Searches all conversations and opens the one a result belongs to.
+
+    Queries go straight to the store's full-text index, so results come back
+    fast enough to run on the Tk thread as the user presses Enter.
+    """
+
+    def __init__(self, app, query=""):
+        super().__init__(app.root)
+        self.app = app
+        self.title("Search Conversations")
+        self.geometry("800x500")
+        self.configure(bg=app.bg_color)
+        self.results = []
+
+        search_frame = ttk.Frame(self, style="TFrame")
+        search_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        self.query_entry = tk.Entry(search_frame, bg=app.entry_bg, fg=app.fg_color,
+                                    insertbackground=app.fg_color, bd=0, font=("Arial", 11))
+        self.query_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10), ipady=4)
+        self.query_entry.insert(0, query)
+        self.query_entry.bind("<Return>", lambda e: self.run())
+
+        self.search_btn = tk.Button(search_frame, text="Search", command=self.run,
+                                    bg=app.accent_color, fg=app.fg_color, bd=0, padx=15, pady=5,
+                                    font=("Arial", 10, "bold"), cursor="hand2")
+        self.search_btn.pack(side=tk.LEFT)
+
+        self.status = ttk.Label(self, text="Double-click a result to open its conversation", style="TLabel")
+        self.status.pack(anchor=tk.W, padx=10)
+
+        list_frame = ttk.Frame(self, style="TFrame")
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(5, 10))
+
+        self.result_list = tk.Listbox(list_frame, bg=app.chat_bg, fg=app.fg_color, bd=0,
+                                      selectbackground=app.accent_color, font=("Arial", 10),
+                                      activestyle="none")
+        result_scroll = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.result_list.yview)
+        self.result_list.configure(yscrollcommand=result_scroll.set)
+        self.result_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        result_scroll.pack(side=tk.LEFT, fill=tk.Y)
+        self.result_list.bind("<Double-Button-1>", lambda e: self.open_selected())
+        self.result_list.bind("<Return>", lambda e: self.open_selected())
+
+        self.query_entry.focus_set()
+        if query:
+            self.run()
+
+    def run(self):
+        query = self.query_entry.get().strip()
+        if not query:
+            return
+
+        started = time.perf_counter()
+        try:
+            self.results = self.app.store.search(query, limit=self.app.config.get("search_max_results", 200))
+        except sqlite3.Error as e:
+            self.status.config(text=f"Search failed: {e}")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+
+        self.result_list.delete(0, tk.END)
+        for result in self.results:
+            snippet = " ".join(result["snippet"].split())
+            self.result_list.insert(tk.END, f"{result['title']}  |  {result['role']}: {snippet}")
+        self.status.config(text=f"{len(self.results)} result(s) in {elapsed:.1f} ms")
+
+    def open_selected(self):
+        selection = self.result_list.curselection()
+        if not selection:
+            return
+        self.app.switch_conversation(self.results[selection[0]]["conversation_id"])
@@ -0,0 +1,31 @@
+"""
+Wall-clock checkpoints from interpreter start to the first mapped window
+"""
+
+import time
+
+
+class StartupProfile:
+    """Records named checkpoints relative to when the main module started importing"""
+
+    def __init__(self, started_at=None):
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def elapsed(self, name=None):
+        """Seconds from start to the named checkpoint (or the latest one)"""
+        for mark_name, at in reversed(self.marks):
+            if name is None or mark_name == name:
+                return at - self.started_at
+        return None
+
+    def report(self):
+        lines = ["Startup profile (ms):"]
+        previous = self.started_at
+        for name, at in self.marks:
+            lines.append(f"  {name:<24} +{(at - previous) * 1000:8.1f}  = {(at - self.started_at) * 1000:8.1f}")
+            previous = at
+        return "\n".join(lines)
@@ -0,0 +1,161 @@
+"""
+Single-threaded text-to-speech worker that speaks streamed text sentence by sentence
+"""
+
+import queue
+import re
+import sys
+import threading
+
+# A sentence ends at ., ! or ? followed by whitespace, or at a blank line
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+INLINE_CODE = re.compile(r'`[^`]*`')
+MARKDOWN_LINK = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+MARKDOWN_CHARS = re.compile(r'[*_`#>|]')
+BLOCK_MARKERS = re.compile(r'(```|<thinking>|</thinking>)')
+
+
+def load_tts_engine():
+    """Probe for audio output and start pyttsx3, returning the engine or None.
+
+    This is slow (a subprocess on Linux plus the speech driver start-up), so it
+    runs on the worker thread the first time TTS is enabled.
+    """
+    if sys.platform.startswith('linux'):
+        # Check if any sound cards are available
+        try:
+            import subprocess
+            result = subprocess.run(['aplay', '-l'], capture_output=True, text=True, timeout=5)
+            if 'card' not in result.stdout.lower():
+                return None
+        except Exception:
+            return None
+    
+    try:
+        import pyttsx3
+    except ImportError:
+        return None
+    
+    if sys.platform.startswith('linux'):
+        # Suppress all output during TTS initialization
+        import io
+        old_stdout = sys.stdout
+        old_stderr = sys.stderr
+        sys.stdout = io.StringIO()
+        sys.stderr = io.StringIO()
+    
+    try:
+        return pyttsx3.init()
+    except Exception:
+        # Silently fail - TTS just won't be available
+        return None
+    finally:
+        if sys.platform.startswith('linux'):
+            sys.stdout = old_stdout
+            sys.stderr = old_stderr
+
+
+class TTSWorker:
+    """Owns the pyttsx3 engine on one thread and speaks queued sentences in order.
+
+    Text is fed in as it arrives; each complete sentence is cleaned of markdown
+    once and queued, so speech starts before the full reply is in. cancel()
+    drops everything queued and stops the sentence being spoken.
+    """
+
+    def __init__(self, engine_factory, on_ready=None):
+        self.engine_factory = engine_factory
+        self.on_ready = on_ready
+        self.engine = None
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.speaking_generation = 0
+        self.buffer = ""
+        self.in_code_block = False
+        self.in_thinking = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def feed(self, text):
+        """Add streamed text, queueing every sentence it completes"""
+        with self.lock:
+            self.buffer += text
+            parts = SENTENCE_END.split(self.buffer)
+            self.buffer = parts.pop()
+            for sentence in parts:
+                self._enqueue(sentence)
+
+    def flush(self):
+        """Queue whatever is left once the message is complete"""
+        with self.lock:
+            self._enqueue(self.buffer)
+            self.buffer = ""
+            self.in_code_block = False
+            self.in_thinking = False
+
+    def speak(self, text):
+        self.feed(text)
+        self.flush()
+
+    def cancel(self):
+        """Drop queued speech and interrupt the current sentence"""
+        with self.lock:
+            self.generation += 1
+            self.buffer = ""
+            self.in_code_block = False
+            self.in_thinking = False
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def _enqueue(self, sentence):
+        text = self._clean(sentence)
+        if text:
+            self.queue.put((self.generation, text))
+
+    def _clean(self, sentence):
+        """Strip code blocks, thinking blocks and markdown from one sentence"""
+        spoken = []
+        for part in BLOCK_MARKERS.split(sentence):
+            if part == "```":
+                self.in_code_block = not self.in_code_block
+            elif part == "<thinking>":
+                self.in_thinking = True
+            elif part == "</thinking>":
+                self.in_thinking = False
+            elif not self.in_code_block and not self.in_thinking:
+                spoken.append(part)
+
+        text = INLINE_CODE.sub('', ''.join(spoken))
+        text = MARKDOWN_LINK.sub(r'\1', text)
+        text = MARKDOWN_CHARS.sub('', text)
+        return ' '.join(text.split())
+
+    def _on_word(self, name, location, length):
+        # Runs inside the engine loop, the only safe place to stop it
+        if self.speaking_generation != self.generation:
+            self.engine.stop()
+
+    def _run(self):
+        self.engine = self.engine_factory()
+        if self.on_ready:
+            self.on_ready(self.engine is not None)
+        if self.engine is None:
+            return
+
+        self.engine.connect('started-word', self._on_word)
+        while True:
+            generation, sentence = self.queue.get()
+            if generation != self.generation:
+                continue
+            self.speaking_generation = generation
+            try:
+                self.engine.say(sentence)
+                self.engine.runAndWait()
+            except Exception as e:
+                print(f"TTS error: {e}")
@@ -0,0 +1,114 @@
+"""
+Thread-safe queue that hands worker-thread events to the Tk thread once per frame
+"""
+
+import sys
+import threading
+
+# Event kinds: a plain call, merged text for one call, a list of items for a batch handler, a deduplicated refresh
+CALL, TEXT, ITEMS, ONCE = range(4)
+
+
+class UIEventQueue:
+    """Collects UI work from any thread and runs it on the Tk thread every `interval` ms.
+
+    Workers never call into Tk, not even root.after; they only append to a
+    locked list that the Tk thread drains. While events wait for the next
+    frame, post_text() calls to the same function with the same arguments
+    merge into one call with the joined text. Consecutive post_item() calls
+    pass their items to one batch call, and post_once() skips a refresh that
+    is already queued.
+
+    Events run in the order they were posted. The one exception: text may
+    merge past pending text of other `channel`s, i.e. other widgets, so
+    interleaved streams still collapse to one insert each per frame.
+    """
+
+    def __init__(self, root, interval=16):
+        self.root = root
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.events = []
+        self.queued_once = set()
+        self.running = False
+        # Events posted vs. calls made on the Tk thread, to see how much coalescing saves
+        self.posted = 0
+        self.dispatched = 0
+
+    def start(self):
+        self.running = True
+        self.root.after(self.interval, self._drain)
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def post(self, func, *args):
+        """Run func(*args) on the Tk thread"""
+        with self.lock:
+            self.posted += 1
+            self.events.append([CALL, func, args, None, None])
+
+    def post_text(self, func, *args, text, channel=None, **kwargs):
+        """Run func(*args, text=..., **kwargs), merged with pending text for the same call.
+
+        `channel` names the widget the text goes to (by default one per func).
+        Text merges into the latest pending text of its channel if only text
+        for other channels was posted after it.
+        """
+        if not text:
+            return
+        channel = func if channel is None else channel
+        with self.lock:
+            self.posted += 1
+            for event in reversed(self.events):
+                if event[0] != TEXT:
+                    break
+                if event[4] == channel:
+                    if event[1] == func and event[2] == (args, kwargs):
+                        event[3].append(text)
+                        return
+                    break
+            self.events.append([TEXT, func, (args, kwargs), [text], channel])
+
+    def post_item(self, func, item):
+        """Run func(items) with this item and any directly following ones for the same func"""
+        with self.lock:
+            self.posted += 1
+            last = self.events[-1] if self.events else None
+            if last and last[0] == ITEMS and last[1] == func:
+                last[3].append(item)
+            else:
+                self.events.append([ITEMS, func, None, [item], None])
+
+    def post_once(self, func, *args):
+        """Run func(*args) unless the same call is already waiting for the next frame"""
+        with self.lock:
+            self.posted += 1
+            if (func, args) in self.queued_once:
+                return
+            self.queued_once.add((func, args))
+            self.events.append([ONCE, func, args, None, None])
+
+    def _drain(self):
+        with self.lock:
+            events, self.events = self.events, []
+            self.queued_once.clear()
+
+        try:
+            for kind, func, args, data, _ in events:
+                self.dispatched += 1
+                try:
+                    if kind == TEXT:
+                        args, kwargs = args
+                        func(*args, text="".join(data), **kwargs)
+                    elif kind == ITEMS:
+                        func(data)
+                    else:
+                        func(*args)
+                except Exception:
+                    # Same reporting as an exception in a Tk callback; the remaining events still run
+                    self.root.report_callback_exception(*sys.exc_info())
+        finally:
+            if self.running:
+                self.root.after(self.interval, self._drain)